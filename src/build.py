@@ -7,10 +7,21 @@ build.py
 * 失敗しても dummy DB を生成して返すので、後段の解析が止まらない。
 """
 from __future__ import annotations
-import json, subprocess
+import json, re, subprocess
 from pathlib import Path
 from typing import List
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# 古いツールチェーンを指す依存ファイルのマーカー
+# (複数パターンでも 1 パスで走査できるよう単一の正規表現に合成)
+STALE_TOOLCHAIN_MARKERS: tuple[bytes, ...] = (b"/mnt/disk/toolschain",)
+_STALE_RE = re.compile(b"|".join(re.escape(m) for m in STALE_TOOLCHAIN_MARKERS))
+
 # ---------------------------------------------------------------------------
 # public API
 # ---------------------------------------------------------------------------
@@ -22,7 +33,6 @@ def clean_stale_dependencies(base: Path, verbose: bool = False) -> int:
     Returns:
         削除したファイル数
     """
-    stale_path = "/mnt/disk/toolschain"
     cleaned = 0
     
     for dep_file in base.rglob("*.d"):
@@ -35,14 +45,11 @@ def clean_stale_dependencies(base: Path, verbose: bool = False) -> int:
             with open(dep_file, 'rb') as f:
                 content_bytes = f.read()
             
-            # UTF-8でデコードを試みる
-            try:
-                content = content_bytes.decode('utf-8', errors='strict')
-            except UnicodeDecodeError:
-                # バイナリファイルの場合はスキップ
+            # UTF-8 として読めないバイナリファイルはスキップ
+            if not is_text_content(content_bytes):
                 continue
                 
-            if stale_path in content:
+            if has_stale_marker(content_bytes):
                 dep_file.unlink()
                 cleaned += 1
                 if verbose:
@@ -53,6 +60,18 @@ def clean_stale_dependencies(base: Path, verbose: bool = False) -> int:
     
     return cleaned
 
+def is_text_content(content: bytes) -> bool:
+    """UTF-8 として厳密にデコードできるか（バイナリファイルの判定用。デコード結果は使わない）"""
+    try:
+        content.decode('utf-8', errors='strict')
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def has_stale_marker(content: bytes) -> bool:
+    """依存ファイルの内容に古いツールチェーンのマーカーが含まれるか"""
+    return _STALE_RE.search(content) is not None
+
 def ensure_ta_db(ta_dir: Path, project_root: Path,
                  devkit: Path | None = None, verbose: bool=False) -> Path:
     # ビルド前に古い依存関係をクリーン
@@ -60,29 +79,31 @@ def ensure_ta_db(ta_dir: Path, project_root: Path,
     if cleaned > 0 and verbose:
         print(f"[INFO] Cleaned {cleaned} stale dependency files")
     
-    db_path = _try_build(project_root, verbose) or _try_build(ta_dir, verbose)
-    if not _valid(db_path):
+    # ビルド成功時は検証時にパースした entries をそのまま使い、再読込しない
+    built = _try_build(project_root, verbose) or _try_build(ta_dir, verbose)
+    # .c の一覧はビルド後に 1 回だけ走査し、件数確認と dummy 生成で使い回す
+    c_sources = list(ta_dir.rglob("*.c"))
+    if built:
+        db_path, entries_all = built
+    else:
         if verbose: print("[WARN] build failed/empty → dummy DB")
         db_path = ta_dir / "compile_commands_full.json"
-        _gen_dummy(ta_dir, db_path, devkit, verbose)
+        entries_all = _gen_dummy(ta_dir, db_path, devkit, verbose, c_sources)
 
     # ---------- TA-only 抽出 ----------
-    entries_all = _load(db_path)
     ta_entries  = [e for e in entries_all
                    if Path(e["file"]).resolve().is_relative_to(ta_dir)]
 
     # *.c の総数より少なければ dummy で上書き
-    if len(list(ta_dir.rglob("*.c"))) > len(ta_entries):
+    if len(c_sources) > len(ta_entries):
         if verbose: print("[WARN] bear が拾えなかった .c がある → dummy 補完")
-        _gen_dummy(ta_dir, db_path, devkit, verbose)
-        ta_entries = _load(db_path)     # 生成し直し
+        ta_entries = _gen_dummy(ta_dir, db_path, devkit, verbose, c_sources)     # 生成し直し
 
     if not ta_entries:                 # 念押し
-        _gen_dummy(ta_dir, db_path, devkit, verbose)
-        ta_entries = _load(db_path)
+        ta_entries = _gen_dummy(ta_dir, db_path, devkit, verbose, c_sources)
 
     ta_db = ta_dir / "compile_commands.json"
-    ta_db.write_text(json.dumps(ta_entries, indent=2), encoding="utf-8")
+    _write_db(ta_db, ta_entries)
     if verbose: print(f"[INFO] TA DB saved: {ta_db}  entries={len(ta_entries)}")
     if devkit:
         dummy_ok = True 
@@ -100,7 +121,7 @@ def _run(cmd: List[str], cwd: Path, v: bool) -> bool:
         print(f"[WARN]   ↳ rc={res.returncode}")
     return res.returncode == 0
 
-def _try_build(base: Path, verbose: bool) -> Path | None:
+def _try_build(base: Path, verbose: bool) -> tuple[Path, list[dict]] | None:
     cmds: list[list[str]] = []
     if (base / "build.sh").is_file():
         cmds.append(["bear", "--", str(base / "build.sh")])
@@ -118,24 +139,36 @@ def _try_build(base: Path, verbose: bool) -> Path | None:
     for cmd in cmds:
         if _run(cmd, base, verbose):
             for db in (base / "compile_commands.json", base / "build" / "compile_commands.json"):
-                if _valid(db):
-                    return db
+                entries = _load_valid(db)
+                if entries:
+                    return db, entries
     return None
 
-def _valid(p: Path | None) -> bool:
-    if not p or not p.is_file():
-        return False
+def _load_valid(p: Path | None) -> list[dict]:
+    """compile DB を一度だけパースして返す（存在しない/空/不正なら []）"""
+    if not p:
+        return []
     try:
-        return bool(json.loads(p.read_text()))
-    except json.JSONDecodeError:
-        return False
+        # 空ファイルはパースせずに弾く
+        if p.stat().st_size == 0:
+            return []
+        data = p.read_bytes()
+        return (orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)) or []
+    except (OSError, ValueError):
+        # orjson.JSONDecodeError / json.JSONDecodeError はどちらも ValueError のサブクラス
+        return []
 
 
-def _load(p: Path) -> list[dict]:
-    return json.loads(p.read_text())
+def _write_db(path: Path, entries: list[dict]) -> None:
+    """compile DB を 2 スペースインデントの JSON で書き出す"""
+    if ORJSON_AVAILABLE:
+        path.write_bytes(orjson.dumps(entries, option=orjson.OPT_INDENT_2))
+    else:
+        path.write_text(json.dumps(entries, indent=2), encoding="utf-8")
 
 
-def _gen_dummy(ta_dir: Path, target: Path, devkit: Path | None, verbose: bool):
+def _gen_dummy(ta_dir: Path, target: Path, devkit: Path | None, verbose: bool,
+               c_sources: list[Path] | None = None) -> list[dict]:
     incs = [f"-I{ta_dir}", f"-I{ta_dir}/include"]
     if devkit:
         incs.append(f"-I{devkit}/include")
@@ -143,7 +176,8 @@ def _gen_dummy(ta_dir: Path, target: Path, devkit: Path | None, verbose: bool):
         "directory": str(ta_dir),
         "file": str(c),
         "arguments": [*incs, "-c", str(c)]
-    } for c in ta_dir.rglob("*.c")]
-    target.write_text(json.dumps(entries, indent=2), encoding="utf-8")
+    } for c in (ta_dir.rglob("*.c") if c_sources is None else c_sources)]
+    _write_db(target, entries)
     if verbose:
-        print(f"[INFO] ★ dummy DB {len(entries)} entries → {target}")
\ No newline at end of file
+        print(f"[INFO] ★ dummy DB {len(entries)} entries → {target}")
+    return entries
\ No newline at end of file
@@ -6,15 +6,23 @@ from typing import Set, List, Dict, Tuple, Optional
 
 from parsing.parsing import load_compile_commands, parse_sources, extract_functions
 
-def classify_functions(project_root: Path, compile_db: Path) -> Tuple[List[Dict], List[Dict]]:
+def classify_functions(project_root: Path, compile_db: Path,
+                       jobs: Optional[int] = None,
+                       ast_cache: Optional[Path] = None,
+                       verbose: bool = False) -> Tuple[List[Dict], List[Dict]]:
     """
     フェーズ1・2：関数＆マクロ抽出 → 定義（内部関数） vs 宣言（外部関数＋マクロ）で分類
     
+    Args:
+        jobs: ソースの並列パース数（None なら CPU 数）
+        ast_cache: パース済み AST のキャッシュディレクトリ（None ならキャッシュしない）
+        verbose: パース時の [DEBUG] 出力を表示する
+    
     Returns:
         (user_defined_functions, external_declarations)
     """
     entries = load_compile_commands(str(compile_db))
-    asts = parse_sources(entries)
+    asts = parse_sources(entries, jobs=jobs, cache_dir=ast_cache, verbose=verbose)
 
     user_defined: List[Dict] = []
     external: List[Dict] = []
@@ -317,7 +325,12 @@ if __name__ == '__main__':
                        help='compile_commands.jsonのパス')
     parser.add_argument('-v', '--verbose', action='store_true',
                        help='詳細な出力')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                       help='ソースの並列パース数（既定: CPU 数）')
+    parser.add_argument('--ast-cache', type=Path, default=None,
+                       help='パース済み AST のキャッシュディレクトリ（再実行時に未変更の TU を再利用）')
     args = parser.parse_args()
 
-    users, externals = classify_functions(args.project_root, args.compile_commands)
+    users, externals = classify_functions(args.project_root, args.compile_commands,
+                                          args.jobs, args.ast_cache, args.verbose)
     print_classification_summary(users, externals, args.verbose)
\ No newline at end of file
@@ -10,6 +10,12 @@ from pathlib import Path
 from typing import List, Dict, Tuple, Optional, Set
 from clang.cindex import Index, CursorKind, TranslationUnit, CompilationDatabase
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 
 class ClangUtils:
     """Clang AST操作のユーティリティクラス"""
@@ -40,8 +46,10 @@ class ClangUtils:
             コンパイルエントリのリスト
         """
         try:
-            with open(self.compile_db_path, 'r', encoding='utf-8') as f:
-                entries = json.load(f)
+            # バイト列のまま渡す（orjson があればデコードを挟まず高速にパース）
+            with open(self.compile_db_path, 'rb') as f:
+                data = f.read()
+            entries = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
             
             if self.verbose:
                 print(f"[ClangUtils] Loaded {len(entries)} compile entries")
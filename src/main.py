@@ -6,7 +6,13 @@ from pathlib import Path
 import time
 from datetime import datetime, timedelta
 
-from build import ensure_ta_db
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from build import ensure_ta_db, has_stale_marker, is_text_content
 from classify.classifier import classify_functions          # type: ignore
 
 # ------------------------------------------------------------
@@ -24,8 +30,12 @@ def run(cmd: list[str], cwd: Path, verbose: bool, phase_name: str = ""):
     if verbose:
         print(f"[INFO] $ {' '.join(cmd)}  (cwd={cwd})")
     
+    # 子プロセスの .pyc 書き出しを抑止して起動コストを削減
+    # (-S は各フェーズが site-packages に依存するため付与しない)
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+
     try:
-        res = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+        res = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True, env=env)
         
         # エラーが発生した場合
         if res.returncode != 0:
@@ -117,14 +127,11 @@ def clean_project_dependencies(proj_path: Path, verbose: bool = False):
             with open(dep_file, 'rb') as f:
                 content_bytes = f.read()
             
-            # UTF-8でデコードを試みる
-            try:
-                content = content_bytes.decode('utf-8', errors='strict')
-            except UnicodeDecodeError:
-                # バイナリファイルの場合はスキップ
+            # UTF-8 として読めないバイナリファイルはスキップ
+            if not is_text_content(content_bytes):
                 continue
             
-            if "/mnt/disk/toolschain" in content:
+            if has_stale_marker(content_bytes):
                 dep_file.unlink()
                 cleaned_count += 1
                 if verbose:
@@ -258,13 +265,19 @@ def process_project(proj: Path, identify_py: Path, skip: set[str], v: bool,
         # Step2: 関数分類
         phase_start = time.time()
         try:
-            users, externals = classify_functions(ta_dir, ta_db)
+            users, externals = classify_functions(ta_dir, ta_db, verbose=v)
             phase12 = res_dir / f"{ta_dir.name}_phase12.json"
-            phase12.write_text(json.dumps({
+            phase12_data = {
                 "project_root": str(ta_dir),
                 "user_defined_functions": users,
                 "external_declarations": externals,
-            }, indent=2, ensure_ascii=False))
+            }
+            # orjson があれば UTF-8 バイト列を直接書き出す（str を経由しない）
+            if ORJSON_AVAILABLE:
+                phase12.write_bytes(orjson.dumps(phase12_data, option=orjson.OPT_INDENT_2))
+            else:
+                phase12.write_text(json.dumps(phase12_data, indent=2, ensure_ascii=False),
+                                   encoding="utf-8")
             print(f"[phase1-2] → {phase12}")
         except Exception as e:
             print(f"[ERROR] Failed in phase 1-2 (function classification): {e}")
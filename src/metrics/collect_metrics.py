@@ -14,6 +14,8 @@ OP-TEE TA 解析結果メトリクス収集ツール（日本語Excel出力・
   * DITINGが start_line/end_line を持つ場合は start_line を採用
 - 日本語カラム・日本語シート名で Excel を出力（列幅は各列の最長表示幅に自動調整）
 - 出力: 既定で src/metrics/analysis_metrics.xlsx
+  * --detail-format feather|parquet で「検出詳細」を <out>.detail.* に別出力（要 pyarrow）
+  * --no-detail で「検出詳細」の収集・出力を省略（件数・統計のみ）
 
 使い方:
   python3 src/metrics/collect_metrics.py \
@@ -27,34 +29,162 @@ from __future__ import annotations
 
 import argparse
 import json
+import math
+import os
 import re
+import zipfile
+import xml.etree.ElementTree as ET
+from os.path import basename
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple, Set, DefaultDict
-from collections import defaultdict
-
+from typing import Any, Dict, List, Optional, Tuple, Set
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache, partial
+from itertools import chain
+from xml.sax.saxutils import escape as xml_escape
+
+import numpy as np
 import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
+
+try:
+    import xlsxwriter
+    XLSXWRITER_AVAILABLE = True
+except ImportError:
+    XLSXWRITER_AVAILABLE = False
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import ijson
+    IJSON_AVAILABLE = True
+except ImportError:
+    IJSON_AVAILABLE = False
+
+try:
+    import pyarrow as pa
+    from pyarrow import csv as pacsv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 # ------------------------------------------------------------
 # ユーティリティ
 # ------------------------------------------------------------
 
+def loads_json_bytes(data: bytes) -> Any:
+    """
+    UTF-8 の JSON バイト列をデコード。orjson があれば優先し（decode 不要・高速）、
+    NaN 等 orjson が受け付けない入力は標準 json にフォールバック。
+    """
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
 def safe_read_json(path: Path) -> Optional[Any]:
     try:
         if path.is_file():
-            return json.loads(path.read_text(encoding="utf-8"))
+            return loads_json_bytes(path.read_bytes())
     except Exception:
         return None
     return None
 
+# トップレベル配列の要素そのものを表す ijson イベント（要素内部のイベントは prefix が "item." になる）
+_IJSON_ITEM_EVENTS = frozenset(("start_map", "start_array", "string", "number", "boolean", "null"))
+
+def json_array_len(path: Path) -> Optional[int]:
+    """
+    トップレベルが配列の JSON の要素数だけを返す（配列でない/読めない場合は None）。
+    ijson があれば要素オブジェクトを構築せずにイベントを数え、無ければ全体をパースする。
+    """
+    if not path.is_file():
+        return None
+    if IJSON_AVAILABLE:
+        try:
+            with path.open("rb") as f:
+                events = ijson.parse(f)
+                _, first, _ = next(events)
+                if first != "start_array":
+                    return None
+                return sum(1 for prefix, event, _ in events
+                           if prefix == "item" and event in _IJSON_ITEM_EVENTS)
+        except Exception:
+            return None
+    data = safe_read_json(path)
+    return len(data) if isinstance(data, list) else None
+
+def json_member_lens(path: Path, keys: Tuple[str, ...]) -> Optional[Dict[str, int]]:
+    """
+    トップレベルがオブジェクトの JSON について、指定メンバー（配列/オブジェクト）の要素数を返す。
+    存在しないメンバーは結果に含めない（トップレベルがオブジェクトでない/読めない場合は None）。
+    ijson があれば 1 パスのイベント走査で数え、要素そのものは構築しない。
+    """
+    if not path.is_file():
+        return None
+    if IJSON_AVAILABLE:
+        try:
+            with path.open("rb") as f:
+                events = ijson.parse(f)
+                _, first, _ = next(events)
+                if first != "start_map":
+                    return None
+                lens: Dict[str, int] = {}
+                arrays: Set[str] = set()
+                item_prefixes = {f"{k}.item": k for k in keys}
+                for prefix, event, _ in events:
+                    if prefix in keys:
+                        if event == "start_array":
+                            lens[prefix] = 0
+                            arrays.add(prefix)
+                        elif event == "start_map":
+                            lens[prefix] = 0
+                        elif event == "map_key":
+                            lens[prefix] += 1
+                    elif prefix in item_prefixes and event in _IJSON_ITEM_EVENTS:
+                        key = item_prefixes[prefix]
+                        if key in arrays:
+                            lens[key] += 1
+                return lens
+        except Exception:
+            return None
+    data = safe_read_json(path)
+    if not isinstance(data, dict):
+        return None
+    return {k: len(data[k]) for k in keys if isinstance(data.get(k), (list, dict))}
+
 def safe_read_text(path: Path) -> Optional[str]:
     try:
         if path.is_file():
-            return path.read_text(encoding="utf-8", errors="ignore")
+            # read_bytes で一括読み込みしてから一度だけデコード（テキストラッパーを作らない）
+            return path.read_bytes().decode("utf-8", errors="ignore")
     except Exception:
         return None
     return None
 
+# 全角（表示幅 2）とみなすコードポイント範囲
+_WIDE_RANGES = (
+    (0x2E80, 0x9FFF),   # 中日韓（ひら・カタカナ 0x3040-0x30FF を含む）
+    (0xAC00, 0xD7AF),   # 韓
+    (0xFF01, 0xFF60),   # 全角記号
+    (0xFFE0, 0xFFE6),
+)
+# translate で削除し、減った文字数 = 全角文字数
+_WIDE_DELETE_TABLE = dict.fromkeys(chain.from_iterable(range(lo, hi + 1) for lo, hi in _WIDE_RANGES))
+# pandas の str.count 用（列単位のベクトル化計算）
+_WIDE_CHARS_PATTERN = "[" + "".join(f"{chr(lo)}-{chr(hi)}" for lo, hi in _WIDE_RANGES) + "]"
+
+@lru_cache(maxsize=4096)
 def text_display_len(s: Any) -> int:
     """
     Excel列幅調整用の見かけ文字幅。CJKは2、その他は1で概算。
@@ -62,49 +192,215 @@ def text_display_len(s: Any) -> int:
     if s is None:
         return 0
     t = str(s)
-    width = 0
-    for ch in t:
-        o = ord(ch)
-        if (
-            0x2E80 <= o <= 0x9FFF  # 中日韓
-            or 0xAC00 <= o <= 0xD7AF  # 韓
-            or 0x3040 <= o <= 0x30FF  # ひら・カタカナ
-            or 0xFF01 <= o <= 0xFF60  # 全角記号
-            or 0xFFE0 <= o <= 0xFFE6
-        ):
-            width += 2
-        else:
-            width += 1
-    return width
+    if t.isascii():
+        return len(t)
+    # 文字ごとの判定は str.translate の C ループに任せる
+    return 2 * len(t) - len(t.translate(_WIDE_DELETE_TABLE))
 
-def autosize_all_columns(ws):
+def format_number(v: float, num_format: str) -> str:
+    """Excel の "0" / "0.0" / "0.00" 形式の表示形式で数値を文字列化（列幅計算用）"""
+    decimals = len(num_format.split(".", 1)[1]) if "." in num_format else 0
+    return f"{v:.{decimals}f}"
+
+def compute_col_widths(df: pd.DataFrame, row_formats: Optional[List[Optional[str]]] = None) -> Dict[int, int]:
     """
-    openpyxl ワークシートの全列幅をセルの最長表示幅に合わせて調整。
+    DataFrame から各列の最長表示幅（ヘッダ含む）を列単位で集計。
+    （constant_memory モードでは書き込み済みセルを読み戻せないため書き込み前に求める）
+    row_formats があれば、その行の数値は表示形式を適用した文字列で測る。
     """
-    from openpyxl.utils import get_column_letter
-
-    max_widths: Dict[int, int] = {}
-    for row in ws.iter_rows():
-        for cell in row:
-            if cell.value is None:
+    if row_formats and any(row_formats):
+        df = df.astype(object)
+        for i, num_format in enumerate(row_formats):
+            if not num_format:
                 continue
-            col_idx = cell.column
-            w = text_display_len(cell.value)
-            if w > max_widths.get(col_idx, 0):
-                max_widths[col_idx] = w
+            for j in range(df.shape[1]):
+                v = df.iat[i, j]
+                if isinstance(v, (int, float)) and not isinstance(v, bool) and pd.notna(v):
+                    df.iat[i, j] = format_number(v, num_format)
+
+    widths: Dict[int, int] = {}
+    for c, name in enumerate(df.columns):
+        vals = df[name].dropna()
+        if vals.empty:
+            w = 0
+        elif pd.api.types.is_integer_dtype(vals):
+            # 整数列は最長表記が最大値か最小値（負号付き）のどちらかなので全セルを測らない
+            w = max(len(str(int(vals.max()))), len(str(int(vals.min()))))
+        else:
+            # 表示幅 = 文字数 + 全角文字数 を列単位の文字列演算で求める（セルごとの関数呼び出しをしない）
+            text = vals.astype(str)
+            w = int((text.str.len() + text.str.count(_WIDE_CHARS_PATTERN)).max())
+        widths[c] = max(text_display_len(str(name)), w)
+    return widths
+
+def _col_width(w: int) -> int:
+    return max(8, min(120, w + 2))
 
+def autosize_all_columns(ws, max_widths: Dict[int, int]):
+    """
+    xlsxwriter ワークシートの全列幅を compute_col_widths の結果に合わせて調整。
+    """
     for col_idx, w in max_widths.items():
-        col_letter = get_column_letter(col_idx)
-        ws.column_dimensions[col_letter].width = max(8, min(120, w + 2))
-
-def write_df(ws_name: str, df: pd.DataFrame, writer: pd.ExcelWriter, freeze: str = "A2", apply_autofilter: bool = True):
-    df.to_excel(writer, sheet_name=ws_name, index=False)
-    ws = writer.book[ws_name]
-    if apply_autofilter:
-        ws.auto_filter.ref = ws.dimensions
+        ws.set_column(col_idx, col_idx, _col_width(w))
+
+def _df_columns(df: pd.DataFrame) -> List[List[Any]]:
+    """列ごとに一度だけ Python オブジェクト配列（欠損は None）へ変換"""
+    return [df[name].astype(object).where(df[name].notna(), None).tolist() for name in df.columns]
+
+def write_df(ws_name: str, df: pd.DataFrame, book, freeze: str = "A2", apply_autofilter: bool = True,
+             format_col: Optional[str] = None, data_rows: bool = True):
+    """
+    DataFrame を 1 行ずつ書き出す。book が xlsxwriter の Workbook なら constant_memory モード、
+    openpyxl の Workbook(write_only=True) ならその write_only シートへ流し込む。
+    pandas の to_excel は列優先でセルを書くため constant_memory と併用できない。
+    format_col を指定すると、その列の値（Excel 表示形式）を行内の数値セルに適用し、列自体は出力しない。
+    data_rows=False ならヘッダ・列幅・オートフィルタ等だけを書き、データ行は保存後に
+    splice_sheet_rows で流し込む。
+    """
+    row_formats: Optional[List[Optional[str]]] = None
+    if format_col:
+        row_formats = df[format_col].tolist()
+        df = df.drop(columns=[format_col])
+
+    if isinstance(book, Workbook):
+        _write_df_openpyxl(ws_name, df, book, freeze, apply_autofilter, row_formats, data_rows)
+        return
+
+    ws = book.add_worksheet(ws_name)
+    header_fmt = book.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    num_fmts: Dict[str, Any] = {}
+
+    for c, name in enumerate(df.columns):
+        ws.write(0, c, name, header_fmt)
+
+    # zip で列配列から行を組み立てる
+    for r, row in enumerate(zip(*_df_columns(df)) if data_rows else (), start=1):
+        cell_fmt = None
+        if row_formats and row_formats[r - 1]:
+            nf = row_formats[r - 1]
+            if nf not in num_fmts:
+                num_fmts[nf] = book.add_format({"num_format": nf})
+            cell_fmt = num_fmts[nf]
+        for c, v in enumerate(row):
+            if v is not None:
+                ws.write(r, c, v, cell_fmt if isinstance(v, (int, float)) else None)
+
+    if apply_autofilter and len(df.columns):
+        ws.autofilter(0, 0, len(df), len(df.columns) - 1)
+    if freeze:
+        ws.freeze_panes(freeze)
+    autosize_all_columns(ws, compute_col_widths(df, row_formats))
+
+def _write_df_openpyxl(ws_name: str, df: pd.DataFrame, book: Workbook, freeze: Optional[str],
+                       apply_autofilter: bool, row_formats: Optional[List[Optional[str]]],
+                       data_rows: bool = True):
+    """
+    xlsxwriter が無い環境向け: openpyxl の write_only シートへ ws.append で行を流し込む。
+    write_only では書き込み済みセルを参照できないため、列幅は書き込み前に設定する。
+    """
+    ws = book.create_sheet(ws_name)
+    for col_idx, w in compute_col_widths(df, row_formats).items():
+        ws.column_dimensions[get_column_letter(col_idx + 1)].width = _col_width(w)
     if freeze:
         ws.freeze_panes = freeze
-    autosize_all_columns(ws)
+    if apply_autofilter and len(df.columns):
+        # 範囲は ws.dimensions（全セル走査）ではなく DataFrame の形から求める
+        ws.auto_filter.ref = f"A1:{get_column_letter(df.shape[1])}{df.shape[0] + 1}"
+
+    thin = Side(style="thin")
+    header = []
+    for name in df.columns:
+        cell = WriteOnlyCell(ws, value=name)
+        cell.font = Font(bold=True)
+        cell.border = Border(left=thin, right=thin, top=thin, bottom=thin)
+        cell.alignment = Alignment(horizontal="center", vertical="top")
+        header.append(cell)
+    ws.append(header)
+
+    for r, row in enumerate(zip(*_df_columns(df)) if data_rows else ()):
+        nf = row_formats[r] if row_formats else None
+        if nf:
+            row = [_number_cell(ws, v, nf) if isinstance(v, (int, float)) else v for v in row]
+        ws.append(row)
+
+def _number_cell(ws, v: float, num_format: str) -> WriteOnlyCell:
+    cell = WriteOnlyCell(ws, value=v)
+    cell.number_format = num_format
+    return cell
+
+# ------------------------------------------------------------
+# 大きなシートのセル XML 直接生成
+# ------------------------------------------------------------
+
+# この行数以上の「検出詳細」は Excel ライブラリを通さず、セル XML を直接生成して流し込む
+DIRECT_XML_MIN_ROWS = 50_000
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_XML_CTRL_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XLSX_MAX_STR_LEN = 32767
+_DIMENSION_RE = re.compile(r'<dimension ref="[^"]*"/>')
+
+def _sheet_part(zf: zipfile.ZipFile, ws_name: str) -> str:
+    """workbook.xml と rels からシート名に対応するワークシート XML のパスを引く"""
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    rid = next(sh.get(f"{_NS_REL}id") for sh in wb.iter(f"{_NS_MAIN}sheet") if sh.get("name") == ws_name)
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    target = next(r.get("Target") for r in rels.iter(f"{_NS_PKG_REL}Relationship") if r.get("Id") == rid)
+    return target[1:] if target.startswith("/") else f"xl/{target}"
+
+def _str_cell_xml(ref: str, s: str) -> str:
+    # xlsxwriter と同じく: 長さ上限で切り詰め、制御文字は _xHHHH_、前後の空白は xml:space で保持
+    s = _XML_CTRL_RE.sub(lambda m: f"_x{ord(m.group()):04X}_", xml_escape(s[:_XLSX_MAX_STR_LEN]))
+    space = ' xml:space="preserve"' if s[:1].isspace() or s[-1:].isspace() else ""
+    return f'<c r="{ref}" t="inlineStr"><is><t{space}>{s}</t></is></c>'
+
+def _iter_rows_xml(df: pd.DataFrame, first_row: int = 2):
+    """DataFrame の各行を <row> 要素の文字列として順に返す（欠損セルは出力しない）"""
+    letters = [get_column_letter(i + 1) for i in range(df.shape[1])]
+    for r, row in enumerate(zip(*_df_columns(df)), start=first_row):
+        cells = []
+        for col, v in zip(letters, row):
+            if v is None:
+                continue
+            if isinstance(v, bool):
+                cells.append(f'<c r="{col}{r}" t="b"><v>{int(v)}</v></c>')
+            elif isinstance(v, (int, float)):
+                if math.isfinite(v):
+                    cells.append(f'<c r="{col}{r}"><v>{v:.16G}</v></c>')
+            else:
+                cells.append(_str_cell_xml(f"{col}{r}", str(v)))
+        yield f'<row r="{r}">{"".join(cells)}</row>'
+
+def splice_sheet_rows(xlsx: Path, ws_name: str, df: pd.DataFrame, batch: int = 1000):
+    """
+    保存済み xlsx のシート ws_name（write_df(data_rows=False) で書いたヘッダのみのシート）に、
+    df のデータ行をセル XML として直接書き込む。セルオブジェクトや書式の処理を経ないので、
+    数十万行でも書き出しが速い。シート以外のパーツはそのままコピーする。
+    """
+    tmp = xlsx.with_name(xlsx.name + ".tmp")
+    with zipfile.ZipFile(xlsx) as zin, zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zout:
+        part = _sheet_part(zin, ws_name)
+        for item in zin.infolist():
+            if item.filename != part:
+                zout.writestr(item, zin.read(item.filename))
+                continue
+            head, tail = zin.read(part).decode("utf-8").split("</sheetData>", 1)
+            last = f"{get_column_letter(df.shape[1])}{len(df) + 1}"
+            head = _DIMENSION_RE.sub(f'<dimension ref="A1:{last}"/>', head, count=1)
+            info = zipfile.ZipInfo(part, date_time=item.date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with zout.open(info, "w", force_zip64=True) as f:
+                f.write(head.encode("utf-8"))
+                buf: List[str] = []
+                for row_xml in _iter_rows_xml(df):
+                    buf.append(row_xml)
+                    if len(buf) >= batch:
+                        f.write("".join(buf).encode("utf-8"))
+                        buf.clear()
+                f.write(("".join(buf) + "</sheetData>" + tail).encode("utf-8"))
+    tmp.replace(xlsx)
 
 def ensure_dir(p: Path):
     p.parent.mkdir(parents=True, exist_ok=True)
@@ -162,8 +458,8 @@ class ProjectMetrics:
     phase_rows: List[Dict[str, Any]] = field(default_factory=list)
 
     # 分布など
-    severity_hist: Dict[str, int] = field(default_factory=dict)
-    cwe_hist: Dict[str, int] = field(default_factory=dict)
+    severity_hist: Counter[str] = field(default_factory=Counter)
+    cwe_hist: Counter[str] = field(default_factory=Counter)
 
     # DITING比較
     diting_count: Optional[int] = None
@@ -176,9 +472,26 @@ class ProjectMetrics:
     # 検出詳細
     vuln_rows: List[Dict[str, Any]] = field(default_factory=list)
 
+    # DITING 突合用の (file,line,sink) 三つ組（collect_for_project で抽出。シートには出さない）
+    vd_triplets: List[Tuple[str, int, Optional[str]]] = field(default_factory=list, repr=False)
+
 # ---- ta_vulnerabilities.json ----
 
-def parse_vuln_json(vuln_json: Any, pm: ProjectMetrics):
+def _coerce_line(v: Any) -> Optional[int]:
+    """行番号を int に（"12" / 12.0 も可。数値化できない・整数でなければ None）"""
+    if isinstance(v, int) and not isinstance(v, bool):
+        return v
+    try:
+        f = float(v)
+    except (TypeError, ValueError):
+        return None
+    return int(f) if f.is_integer() else None
+
+def parse_vuln_json(vuln_json: Any, pm: ProjectMetrics, collect_details: bool = True):
+    """
+    統計（トークン/時間/キャッシュ）と脆弱性件数を反映。
+    collect_details=False なら脆弱性ごとの走査（検出詳細・深刻度/CWE 分布）を省く。
+    """
     if vuln_json is None:
         return
 
@@ -217,10 +530,15 @@ def parse_vuln_json(vuln_json: Any, pm: ProjectMetrics):
 
     if isinstance(vulns, list):
         pm.vuln_count = len(vulns)
+        if not collect_details:
+            return
+        # 分布はループ内で Counter を更新せず、キーを集めてから update で一括計上
+        sevs: List[str] = []
+        cwes: List[str] = []
         for v in vulns:
             vd = v.get("vd", {})
             file_path = vd.get("file") or v.get("file")
-            line = vd.get("line") or v.get("line")
+            line = _coerce_line(vd.get("line") or v.get("line"))
             sink = vd.get("sink") or v.get("sink")
 
             details = v.get("vulnerability_details", {})
@@ -232,10 +550,8 @@ def parse_vuln_json(vuln_json: Any, pm: ProjectMetrics):
             if isinstance(flow_summary, dict) and "propagation_path" in flow_summary:
                 chain = " -> ".join(flow_summary["propagation_path"])
 
-            sev_key = sev or "unknown"
-            cwe_key = cwe or "unknown"
-            pm.severity_hist[sev_key] = pm.severity_hist.get(sev_key, 0) + 1
-            pm.cwe_hist[cwe_key] = pm.cwe_hist.get(cwe_key, 0) + 1
+            sevs.append(sev or "unknown")
+            cwes.append(cwe or "unknown")
 
             pm.vuln_rows.append({
                 "プロジェクト": pm.project_name,
@@ -246,55 +562,115 @@ def parse_vuln_json(vuln_json: Any, pm: ProjectMetrics):
                 "深刻度": sev,
                 "チェイン": chain,
             })
+        pm.severity_hist.update(sevs)
+        pm.cwe_hist.update(cwes)
 
 # ---- taint_analysis_log.txt ----
 
+# 8 種類の項目を 1 本の正規表現に合成し、ログ全体を 1 パスで走査する
+_LOG_RE = re.compile(
+    r"所要時間:\s*(?P<elapsed>[0-9.]+)\s*分"
+    r"|LLM呼び出し回数:\s*(?P<calls>[0-9,]+)"
+    r"|総トークン数:\s*(?P<total>[0-9,]+)"
+    r"|入力トークン:\s*(?P<pin>[0-9,]+)"
+    r"|出力トークン:\s*(?P<pout>[0-9,]+)"
+    r"|ヒット数:\s*(?P<hit>[0-9,]+)"
+    r"|ミス数:\s*(?P<miss>[0-9,]+)"
+    r"|ヒット率:\s*(?P<rate>[0-9.]+)%"
+)
+
+# グループ名 → ProjectMetrics の属性名
+_LOG_FIELDS = {
+    "elapsed": "analysis_seconds",
+    "calls": "api_calls",
+    "total": "total_tokens",
+    "pin": "prompt_tokens",
+    "pout": "completion_tokens",
+    "hit": "cache_hits",
+    "miss": "cache_misses",
+    "rate": "cache_hit_rate",
+}
+
+def _apply_log_match(m: re.Match, pm: ProjectMetrics):
+    """_LOG_RE の一致を pm に反映（未設定の項目のみ = 最初の出現を採用）"""
+    key = m.lastgroup
+    val = m.group(key)
+    if key == "elapsed":
+        # 所要時間: "所要時間: 6.4分"
+        if pm.analysis_seconds is None:
+            minutes = float(val)
+            pm.analysis_seconds = minutes * 60.0
+            pm.analysis_time_label = f"{minutes:.1f}分"
+    elif key == "rate":
+        if pm.cache_hit_rate is None:
+            pm.cache_hit_rate = float(val)
+    else:
+        attr = _LOG_FIELDS[key]
+        if getattr(pm, attr) is None:
+            setattr(pm, attr, int(val.replace(",", "")))
+
 def parse_log_for_tokens_and_cache(log_text: str, pm: ProjectMetrics):
     if not log_text:
         return
 
-    # 所要時間: "所要時間: 6.4分"
-    m = re.search(r"所要時間:\s*([0-9.]+)\s*分", log_text)
-    if m and pm.analysis_seconds is None:
-        minutes = float(m.group(1))
-        pm.analysis_seconds = minutes * 60.0
-        pm.analysis_time_label = f"{minutes:.1f}分"
-
-    # LLM呼び出し回数
-    m = re.search(r"LLM呼び出し回数:\s*([0-9,]+)", log_text)
-    if m and pm.api_calls is None:
-        pm.api_calls = int(m.group(1).replace(",", ""))
-
-    # 総トークン数
-    m = re.search(r"総トークン数:\s*([0-9,]+)", log_text)
-    if m and pm.total_tokens is None:
-        pm.total_tokens = int(m.group(1).replace(",", ""))
-
-    # 入力/出力トークン
-    m = re.search(r"入力トークン:\s*([0-9,]+)", log_text)
-    if m and pm.prompt_tokens is None:
-        pm.prompt_tokens = int(m.group(1).replace(",", ""))
-    m = re.search(r"出力トークン:\s*([0-9,]+)", log_text)
-    if m and pm.completion_tokens is None:
-        pm.completion_tokens = int(m.group(1).replace(",", ""))
-
-    # キャッシュ統計
-    mh = re.search(r"ヒット数:\s*([0-9,]+)", log_text)
-    mm = re.search(r"ミス数:\s*([0-9,]+)", log_text)
-    mr = re.search(r"ヒット率:\s*([0-9.]+)%", log_text)
-    if mh and pm.cache_hits is None:
-        pm.cache_hits = int(mh.group(1).replace(",", ""))
-    if mm and pm.cache_misses is None:
-        pm.cache_misses = int(mm.group(1).replace(",", ""))
-    if mr and pm.cache_hit_rate is None:
-        pm.cache_hit_rate = float(mr.group(1))
+    for m in _LOG_RE.finditer(log_text):
+        _apply_log_match(m, pm)
+
+def parse_log_streaming(log_path: Path, pm: ProjectMetrics):
+    """
+    ログを行単位で走査する版。全項目が埋まった時点で読み込みを打ち切るため、
+    巨大なログでもファイル全体をメモリに載せない。
+    """
+    pending = {attr for attr in _LOG_FIELDS.values() if getattr(pm, attr) is None}
+    if not pending:
+        return
+    try:
+        with log_path.open("r", encoding="utf-8", errors="ignore") as f:
+            for line in f:
+                for m in _LOG_RE.finditer(line):
+                    _apply_log_match(m, pm)
+                    pending.discard(_LOG_FIELDS[m.lastgroup])
+                if not pending:
+                    break
+    except Exception:
+        return
 
 # ---- results_dir/time.txt ----
 
-_TIME_KV_RE = re.compile(r"^\s*([A-Za-z ]+):\s*(.+?)\s*$")
+# time.txt は "Phase Breakdown" 見出しの前後で解釈を分ける（前は固定キー、後ろはフェーズ行）。
+# 区間ごとに 1 本の正規表現（行単位、MULTILINE）をテキストに対して 1 パスで走査する。
+# 行内の空白は改行を除く空白 [^\S\n] とし、値は \r を含めない（CRLF でも splitlines した行と同じ結果にする）
+_PHASE_HEADER_RE = re.compile(r"^[^\S\n]*phase breakdown", re.IGNORECASE | re.MULTILINE)
+# 見出しより前: "Analysis Mode: ..." 等（キーは英字と空白のみ、大小文字は問わない）
+_TIME_KV_RE = re.compile(
+    r"^[^\S\n]*(?:"
+    r"(?i:analysis mode)[A-Za-z ]*:[^\S\n]*(?P<mode>[^\r\n]+?)"
+    r"|(?i:token tracking)[A-Za-z ]*:[^\S\n]*(?P<tracking>[^\r\n]+?)"
+    r"|(?i:start time)[A-Za-z ]*:[^\S\n]*(?P<start>[^\r\n]+?)"
+    r"|(?i:end time)[A-Za-z ]*:[^\S\n]*(?P<end>[^\r\n]+?)"
+    r"|(?i:total seconds)[A-Za-z ]*:[^\S\n]*(?P<seconds>[^\r\n]+?)"
+    r"|(?i:total duration)[A-Za-z ]*:[^\S\n]*(?P<duration>[^\r\n]+?)"
+    r")[^\S\n]*$",
+    re.MULTILINE,
+)
+# 見出しより後: "phase6_taint_analysis : 2m 9.31s ( 54.0%)"
+_PHASE_LINE_RE = re.compile(
+    r"^[^\S\n]*(?P<name>[^\r\n]+?):[^\S\n]*(?P<label>(?:[0-9m.]|[^\S\n])+s)[^\S\n]*"
+    r"\([^\S\n]*(?P<ratio>[0-9.]+)%[^\S\n]*\)[^\S\n]*$",
+    re.MULTILINE,
+)
+# 空白を詰めると "name:0.80s(3.4%)" になる行（分の無い表記）。従来どおりフェーズ行としては採らない
 _PHASE_RE = re.compile(r"^\s*(.+?):\s*([0-9.]+)s\s*\(\s*([0-9.]+)%\s*\)\s*$")
 _DURATION_RE = re.compile(r"^\s*(\d+)m\s*([0-9.]+)s\s*$")
 
+# グループ名 → ProjectMetrics の属性名（値をそのまま入れる項目）
+_TIME_FIELDS = {
+    "mode": "analysis_mode",
+    "tracking": "token_tracking",
+    "start": "time_start",
+    "end": "time_end",
+}
+
 def _parse_duration_to_seconds(label: str) -> Optional[float]:
     m = _DURATION_RE.match(label.strip())
     if not m:
@@ -318,58 +694,46 @@ def parse_time_txt(text: str, pm: ProjectMetrics):
     if not text:
         return
 
-    lines = [ln.rstrip("\n") for ln in text.splitlines()]
-    in_phase = False
-    for ln in lines:
-        if ln.strip().lower().startswith("phase breakdown"):
-            in_phase = True
-            continue
+    header = _PHASE_HEADER_RE.search(text)
+    kv_end = header.start() if header else len(text)
 
-        if not in_phase:
-            m = _TIME_KV_RE.match(ln)
-            if not m:
-                continue
-            key = m.group(1).strip().lower()
-            val = m.group(2).strip()
-
-            if key.startswith("analysis mode"):
-                pm.analysis_mode = val
-            elif key.startswith("token tracking"):
-                pm.token_tracking = val
-            elif key.startswith("start time"):
-                pm.time_start = val
-            elif key.startswith("end time"):
-                pm.time_end = val
-            elif key.startswith("total seconds"):
-                # "239.56s" -> 239.56
-                v = val.rstrip("s")
-                try:
-                    pm.time_seconds = float(v)
-                except Exception:
-                    pass
-            elif key.startswith("total duration"):
-                pm.time_label = val
-                # 秒が空で、ラベルが "Xm Y.s" 形式なら秒も埋める
-                if pm.time_seconds is None:
-                    sec = _parse_duration_to_seconds(val)
-                    if sec is not None:
-                        pm.time_seconds = sec
-        else:
-            # フェーズ行
-            m = _PHASE_RE.match(ln.replace(" ", ""))  # スペース詰めてから一致させる
-            if not m:
-                # より寛容に: "phase6_taint_analysis : 2m 9.31s ( 54.0%)" のような表記
-                ln2 = ln.strip()
-                # "name : 2m 9.31s (54.0%)" を取り出す
-                m2 = re.match(r"^(.+?):\s*([0-9m.\s]+s)\s*\(\s*([0-9.]+)%\s*\)\s*$", ln2)
-                if m2:
-                    name = m2.group(1).strip()
-                    label = m2.group(2).strip()
-                    ratio = float(m2.group(3))
-                    seconds = _parse_duration_to_seconds(label) if "m" in label else float(label.rstrip("s"))
-                    pm.phase_rows.append({"プロジェクト": pm.project_name, "フェーズ": name, "秒(time.txt)": seconds, "割合%(time.txt)": ratio})
-                continue
-            # m が取れたときは name は取れないのでスキップ（寛容モードに委譲）
+    for m in _TIME_KV_RE.finditer(text, 0, kv_end):
+        key = m.lastgroup
+        val = m.group(key).strip()
+        if key in _TIME_FIELDS:
+            setattr(pm, _TIME_FIELDS[key], val)
+        elif key == "seconds":
+            # "239.56s" -> 239.56
+            try:
+                pm.time_seconds = float(val.rstrip("s"))
+            except Exception:
+                pass
+        elif key == "duration":
+            pm.time_label = val
+            # 秒が空で、ラベルが "Xm Y.s" 形式なら秒も埋める
+            if pm.time_seconds is None:
+                sec = _parse_duration_to_seconds(val)
+                if sec is not None:
+                    pm.time_seconds = sec
+
+    if header:
+        # 見出し行の次の行からフェーズ行
+        body_start = text.find("\n", header.end())
+        if body_start >= 0:
+            for m in _PHASE_LINE_RE.finditer(text, body_start + 1):
+                line = m.group(0)
+                if line.strip().lower().startswith("phase breakdown"):
+                    continue
+                if _PHASE_RE.match(line.replace(" ", "")):
+                    continue
+                label = m.group("label").strip()
+                seconds = _parse_duration_to_seconds(label) if "m" in label else float(label.rstrip("s"))
+                pm.phase_rows.append({
+                    "プロジェクト": pm.project_name,
+                    "フェーズ": m.group("name").strip(),
+                    "秒(time.txt)": seconds,
+                    "割合%(time.txt)": float(m.group("ratio")),
+                })
 
     # time.txt の秒があり、analysis_seconds が未設定なら補完
     if pm.time_seconds is not None and pm.analysis_seconds is None:
@@ -381,7 +745,7 @@ def parse_time_txt(text: str, pm: ProjectMetrics):
 # 各プロジェクトの収集
 # ------------------------------------------------------------
 
-def collect_for_project(results_dir: Path) -> ProjectMetrics:
+def collect_for_project(results_dir: Path, collect_details: bool = True) -> ProjectMetrics:
     project, prefix = detect_project_and_prefix(results_dir)
     pm = ProjectMetrics(project_name=project, results_dir=results_dir, artifact_prefix=prefix)
 
@@ -402,15 +766,16 @@ def collect_for_project(results_dir: Path) -> ProjectMetrics:
 
     # JSON系
     j_vuln = safe_read_json(f_vuln)
-    j_cands = safe_read_json(f_cands)
     j_chains = safe_read_json(f_chains)
-    j_callg = safe_read_json(f_callg)
     j_sinks = safe_read_json(f_sinks)
     j_vds   = safe_read_json(f_vds)
+    # 生の JSON は持ち回らず、突合に要る三つ組だけを残す（ワーカープロセスから返す量を抑える）
+    pm.vd_triplets = extract_vd_triplets(j_vds, j_chains, j_vuln)
 
-    # 件数集計
-    if isinstance(j_cands, list):
-        pm.candidate_flows = len(j_cands)
+    # 件数集計（候補フローは件数しか使わないので要素を構築せずに数える）
+    n_cands = json_array_len(f_cands)
+    if n_cands is not None:
+        pm.candidate_flows = n_cands
     if isinstance(j_chains, list):
         pm.chains = len(j_chains)
     if isinstance(j_vds, list):
@@ -419,17 +784,18 @@ def collect_for_project(results_dir: Path) -> ProjectMetrics:
         pm.sinks_count = len(j_sinks["sinks"])
     elif isinstance(j_sinks, list):
         pm.sinks_count = len(j_sinks)
-    if isinstance(j_callg, dict) and "edges" in j_callg:
-        pm.callgraph_edges = len(j_callg["edges"])
-        if "definitions" in j_callg and isinstance(j_callg["definitions"], dict):
-            pm.defined_functions = len(j_callg["definitions"])
+    # コールグラフは edges / definitions の件数しか使わないのでストリーム走査で数える
+    callg_lens = json_member_lens(f_callg, ("edges", "definitions"))
+    if callg_lens and "edges" in callg_lens:
+        pm.callgraph_edges = callg_lens["edges"]
+        pm.defined_functions = callg_lens.get("definitions", pm.defined_functions)
 
     # 脆弱性本体/統計
-    parse_vuln_json(j_vuln, pm)
+    parse_vuln_json(j_vuln, pm, collect_details=collect_details)
 
     # ログから補完
     if f_log.is_file():
-        parse_log_for_tokens_and_cache(safe_read_text(f_log) or "", pm)
+        parse_log_streaming(f_log, pm)
 
     # time.txt
     if f_time.is_file():
@@ -437,29 +803,81 @@ def collect_for_project(results_dir: Path) -> ProjectMetrics:
 
     return pm
 
-def scan_results(benchmark_root: Path) -> List[ProjectMetrics]:
-    metrics: List[ProjectMetrics] = []
-    for ta_results in sorted(benchmark_root.glob("*/ta/results")):
-        if not ta_results.is_dir():
-            continue
-        metrics.append(collect_for_project(ta_results))
-    return metrics
+def _iter_results_dirs(benchmark_root: Path):
+    """
+    benchmark/<project>/ta/results を列挙。glob の代わりに os.scandir で 1 階層だけ走査し、
+    ディレクトリ種別は DirEntry のキャッシュで判定する（隠しエントリは対象外）。
+    """
+    try:
+        entries = os.scandir(benchmark_root)
+    except OSError:
+        return
+    with entries:
+        for e in entries:
+            if e.name.startswith(".") or not e.is_dir():
+                continue
+            results = os.path.join(e.path, "ta", "results")
+            if os.path.isdir(results):
+                yield Path(results)
+
+def scan_results(benchmark_root: Path, jobs: Optional[int] = None,
+                 collect_details: bool = True) -> List[ProjectMetrics]:
+    dirs = sorted(_iter_results_dirs(benchmark_root))
+    collect = partial(collect_for_project, collect_details=collect_details)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    # 少数ならプロセス起動のコストの方が大きいので直列で処理
+    if jobs <= 1 or len(dirs) < 2:
+        return [collect(d) for d in dirs]
+    # 各プロジェクトの収集（JSON パース主体）は独立しているのでプロセスで並列化（map は順序を保持）
+    with ProcessPoolExecutor(max_workers=min(jobs, len(dirs))) as ex:
+        return list(ex.map(collect, dirs))
 
 # ------------------------------------------------------------
 # DITING 比較
 # ------------------------------------------------------------
 
+# Path(...).name と同じ結果を PurePath を生成せずに得る（末尾の "/" は除去してから basename）
+# 同じファイル名/プロジェクト名が DITING 行・VD で繰り返し現れるのでメモ化する
+@lru_cache(maxsize=4096)
 def normalize_proj_name(s: str) -> str:
-    return Path(str(s)).name.lower().strip()
+    return basename(str(s).rstrip("/")).lower().strip()
 
+@lru_cache(maxsize=4096)
 def normalize_file_basename(s: str) -> str:
-    return Path(str(s)).name.lower().strip()
+    return basename(str(s).rstrip("/")).lower().strip()
+
+# DITING CSV の行番号列（pyarrow で読む場合は推論させずに型を固定）
+_DITING_LINE_COLUMNS = ("line", "start_line", "end_line")
+
+# pandas.read_csv の既定の欠損値表記。pyarrow は既定では文字列列の空セルを "" のまま返すため、
+# 文字列列にも同じ表記を欠損として適用し、pandas で読んだ場合と同じ NaN/None を得る
+_CSV_NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+def _read_csv_arrow(path: Path) -> Optional[pd.DataFrame]:
+    """pyarrow のマルチスレッド CSV リーダで読む（失敗時は None を返し pandas に任せる）"""
+    try:
+        opts = pacsv.ConvertOptions(column_types={c: pa.int32() for c in _DITING_LINE_COLUMNS},
+                                    null_values=_CSV_NULL_VALUES, strings_can_be_null=True)
+        return pacsv.read_csv(path, convert_options=opts).to_pandas()
+    except Exception:
+        return None
+
+def normalize_name_series(s: pd.Series) -> pd.Series:
+    """normalize_proj_name / normalize_file_basename の列版（行ごとの Python 呼び出しをしない）"""
+    return (s.astype(str).str.rstrip("/").str.replace(r"^.*/", "", regex=True)
+            .str.lower().str.strip())
 
 def load_diting_csv(diting_path: Path) -> Optional[pd.DataFrame]:
     if not diting_path.is_file():
         return None
     try:
-        df = pd.read_csv(diting_path)
+        df = _read_csv_arrow(diting_path) if PYARROW_AVAILABLE else None
+        if df is None:
+            df = pd.read_csv(diting_path)
         # 列名を標準化（小文字化）
         df.columns = [c.strip().lower() for c in df.columns]
         return df
@@ -472,48 +890,46 @@ def pick_column(df: pd.DataFrame, candidates: List[str]) -> Optional[str]:
             return c
     return None
 
-def extract_vd_triplets(pm: ProjectMetrics) -> List[Tuple[str,int,Optional[str]]]:
+def extract_vd_triplets(vds: Any, chains: Any, vj: Any) -> List[Tuple[str,int,Optional[str]]]:
     """
-    我々側の (file,line,sink?) 三つ組を results から抽出。
+    我々側の (file,line,sink?) 三つ組を collect_for_project がパース済みの JSON から抽出。
     優先: *_vulnerable_destinations.json, 予備: *_chains.json, さらに ta_vulnerabilities.json の vd / inline_findings も採用。
     """
     triplets: List[Tuple[str,int,Optional[str]]] = []
-    prefix = pm.artifact_prefix
+    seen: Set[Tuple[str,int,Optional[str]]] = set()
+
+    def _push(file_: Any, line_: Any, sink_: Any):
+        # 追加時に重複を弾く（出現順は維持）
+        t = (normalize_file_basename(file_), int(line_), str(sink_) if sink_ else None)
+        if t not in seen:
+            seen.add(t)
+            triplets.append(t)
 
     # 1) vulnerable_destinations.json
-    f_vds = pm.results_dir / f"{prefix}_vulnerable_destinations.json"
-    if f_vds.is_file():
+    if isinstance(vds, list):
         try:
-            vds = json.loads(f_vds.read_text(encoding="utf-8"))
-            if isinstance(vds, list):
-                for e in vds:
-                    vd = e.get("vd", e) if isinstance(e, dict) else {}
-                    file_ = vd.get("file"); line_ = vd.get("line"); sink_ = vd.get("sink")
-                    if file_ and line_ is not None:
-                        triplets.append((normalize_file_basename(file_), int(line_), str(sink_) if sink_ else None))
+            for e in vds:
+                vd = e.get("vd", e) if isinstance(e, dict) else {}
+                file_ = vd.get("file"); line_ = vd.get("line"); sink_ = vd.get("sink")
+                if file_ and line_ is not None:
+                    _push(file_, line_, sink_)
         except Exception:
             pass
 
     # 2) chains.json（予備）
-    if not triplets:
-        f_chains = pm.results_dir / f"{prefix}_chains.json"
-        if f_chains.is_file():
-            try:
-                chains = json.loads(f_chains.read_text(encoding="utf-8"))
-                if isinstance(chains, list):
-                    for e in chains:
-                        vd = e.get("vd", {}) if isinstance(e, dict) else {}
-                        file_ = vd.get("file"); line_ = vd.get("line"); sink_ = vd.get("sink")
-                        if file_ and line_ is not None:
-                            triplets.append((normalize_file_basename(file_), int(line_), str(sink_) if sink_ else None))
-            except Exception:
-                pass
+    if not triplets and isinstance(chains, list):
+        try:
+            for e in chains:
+                vd = e.get("vd", {}) if isinstance(e, dict) else {}
+                file_ = vd.get("file"); line_ = vd.get("line"); sink_ = vd.get("sink")
+                if file_ and line_ is not None:
+                    _push(file_, line_, sink_)
+        except Exception:
+            pass
 
     # 3) ta_vulnerabilities.json（補完: vd と inline_findings の行を追加）
-    f_vuln = pm.results_dir / f"{prefix}_vulnerabilities.json"
-    if f_vuln.is_file():
+    if vj is not None:
         try:
-            vj = json.loads(f_vuln.read_text(encoding="utf-8"))
             # a) vulnerabilities[].vd
             vulns = vj.get("vulnerabilities", []) if isinstance(vj, dict) else (vj if isinstance(vj, list) else [])
             if isinstance(vulns, list):
@@ -521,84 +937,112 @@ def extract_vd_triplets(pm: ProjectMetrics) -> List[Tuple[str,int,Optional[str]]
                     vd = v.get("vd", {}) if isinstance(v, dict) else {}
                     file_ = vd.get("file"); line_ = vd.get("line"); sink_ = vd.get("sink")
                     if file_ and line_ is not None:
-                        triplets.append((normalize_file_basename(file_), int(line_), str(sink_) if sink_ else None))
+                        _push(file_, line_, sink_)
             # b) inline_findings[]
             inls = vj.get("inline_findings", []) if isinstance(vj, dict) else []
             if isinstance(inls, list):
                 for it in inls:
                     file_ = it.get("file"); line_ = it.get("line"); sink_ = it.get("sink_function") or it.get("sink")
                     if file_ and line_ is not None:
-                        triplets.append((normalize_file_basename(file_), int(line_), str(sink_) if sink_ else None))
+                        _push(file_, line_, sink_)
         except Exception:
             pass
 
-    # 重複除去
-    triplets = list(dict.fromkeys(triplets))
     return triplets
 
-def compute_matches(pm: ProjectMetrics, diting_df: pd.DataFrame, vd_list: List[Tuple[str,int,Optional[str]]], line_tol: int = 3):
+def prepare_diting_keys(diting_df: pd.DataFrame) -> Optional[pd.DataFrame]:
     """
-    DITING の (project,file,start_line[,sink]) と我々の (file,line[,sink]) を突き合わせ。
-    - sink列が無い場合は (file,line) のみで判定
-    - 行は ±line_tol の許容
+    DITING CSV を突合用のキー列 (_proj,_file,_line,_sink) に一度だけ正規化。
+    - line は start_line を優先（無ければ line/lineno）、数値化できない行は _line=NaN
+    - sink 列が無い/欠損の場合は _sink=None
+    必須列（project/file/line）が無ければ None。
     """
-    if diting_df is None or diting_df.empty:
-        return
-
     col_proj = pick_column(diting_df, ["project", "ta", "name"])
     col_file = pick_column(diting_df, ["file", "source", "path"])
     col_line = pick_column(diting_df, ["line", "lineno", "start_line"])
     col_sink = pick_column(diting_df, ["sink", "function", "callee", "sink_function"])
-    col_end  = pick_column(diting_df, ["end_line"])
 
     if col_proj is None or col_file is None or col_line is None:
-        return
-
-    # 対象プロジェクト（プロジェクト名は 'ta' の親ディレクトリ）
-    dsub = diting_df[diting_df[col_proj].apply(lambda x: normalize_proj_name(str(x)) == pm.project_name.lower())].copy()
-    pm.diting_count = int(dsub.shape[0])
+        return None
 
-    if pm.diting_count == 0:
-        pm.match_count = 0
-        pm.match_rate = 0.0
+    keys = pd.DataFrame({
+        "_proj": normalize_name_series(diting_df[col_proj]),
+        "_file": normalize_name_series(diting_df[col_file]),
+        "_line": pd.to_numeric(diting_df[col_line], errors="coerce"),
+    })
+    if col_sink:
+        sink = diting_df[col_sink]
+        keys["_sink"] = sink.astype(str).where(sink.notna(), None)
+    else:
+        keys["_sink"] = None
+    return keys
+
+def compute_all_matches(projects: List[ProjectMetrics], diting_df: pd.DataFrame, line_tol: int = 3):
+    """
+    DITING の (project,file,start_line[,sink]) と我々の (file,line[,sink]) を全プロジェクト一括で突き合わせ。
+    - 我々側は (project,file) ごとに行番号をソートした配列にし、DITING 行ごとの ±line_tol の窓を
+      np.searchsorted で求める（全組み合わせを展開しない）
+    - DITING 側に sink があれば窓内の sink も一致させる（我々側の sink 不明は許容）
+    - 一致件数は一致した DITING 行の数（1 行は最大 1 回）
+    """
+    if diting_df is None or diting_df.empty:
         return
 
-    # 我々側の索引: file -> [(line, sink)]
-    file2rows: DefaultDict[str, List[Tuple[int, Optional[str]]]] = defaultdict(list)
-    for f, l, s in vd_list:
-        file2rows[normalize_file_basename(f)].append((int(l), s if s else None))
+    keys = prepare_diting_keys(diting_df)
+    if keys is None:
+        return
 
-    matches = 0
-    for _, r in dsub.iterrows():
-        f = normalize_file_basename(r[col_file])
-        # line の決定: start_line を優先（無ければ line/lineno）
-        try:
-            lstart = int(r[col_line])
-        except Exception:
+    # 我々側の索引: (project,file) -> (ソート済み行番号配列, 同順の sink リスト)
+    ours_rows: Dict[Tuple[str, str], List[Tuple[int, Optional[str]]]] = {}
+    for p in projects:
+        proj = p.project_name.lower()
+        for f, l, s in p.vd_triplets:
+            ours_rows.setdefault((proj, f), []).append((int(l), s if s else None))
+    ours: Dict[Tuple[str, str], Tuple[np.ndarray, List[Optional[str]]]] = {}
+    for key, rows in ours_rows.items():
+        rows.sort(key=lambda r: r[0])
+        ours[key] = (np.fromiter((l for l, _ in rows), dtype=np.int64, count=len(rows)),
+                     [s for _, s in rows])
+
+    cand = keys.dropna(subset=["_line"])
+    d_lines = cand["_line"].to_numpy(dtype=float)
+    d_sinks = cand["_sink"].to_numpy(dtype=object)
+    matched = np.zeros(len(cand), dtype=bool)
+    for key, idx in cand.groupby(["_proj", "_file"], sort=False).indices.items():
+        entry = ours.get(key)
+        if entry is None:
             continue
-        # sink（任意）
-        s = str(r[col_sink]) if (col_sink and pd.notna(r[col_sink])) else None
+        lines, sinks = entry
+        lo = np.searchsorted(lines, d_lines[idx] - line_tol, side="left")
+        hi = np.searchsorted(lines, d_lines[idx] + line_tol, side="right")
+        hit = hi > lo
+        # sink 指定のある DITING 行だけ、窓内の sink を Python で確認（窓は小さい）
+        for k in np.flatnonzero(hit):
+            d_sink = d_sinks[idx[k]]
+            if d_sink is not None and not pd.isna(d_sink):
+                hit[k] = any(s is None or s == d_sink for s in sinks[lo[k]:hi[k]])
+        matched[idx] = hit
+
+    diting_counts = keys["_proj"].value_counts()
+    match_counts = cand.loc[matched, "_proj"].value_counts()
 
-        rows = file2rows.get(f, [])
-        if not rows:
+    for p in projects:
+        target = p.project_name.lower()
+        p.diting_count = int(diting_counts.get(target, 0))
+        if p.diting_count == 0:
+            p.match_count = 0
+            p.match_rate = 0.0
             continue
-
-        if s:
-            # sink も一致させる
-            hit = any((abs(l - lstart) <= line_tol and (sr is None or str(sr) == s)) for (l, sr) in rows)
-        else:
-            # sink 不明なら (file,line) 近傍マッチ
-            hit = any(abs(l - lstart) <= line_tol for (l, _sr) in rows)
-        if hit:
-            matches += 1
-
-    pm.match_count = matches
-    pm.match_rate = (matches / pm.diting_count * 100.0) if pm.diting_count else 0.0
+        p.match_count = int(match_counts.get(target, 0))
+        p.match_rate = p.match_count / p.diting_count * 100.0
 
 # ------------------------------------------------------------
 # メイン集計 → 日本語Excel
 # ------------------------------------------------------------
 
+# 概要シートの行ごとの Excel 表示形式（write_df の format_col。シートには出力しない）
+OVERVIEW_FORMAT_COL = "表示形式"
+
 def build_overview_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
     n = len(projects)
     total_vuln = sum(p.vuln_count for p in projects)
@@ -628,161 +1072,203 @@ def build_overview_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
     d_match = sum(p.match_count or 0 for p in projects)
     d_rate  = (d_match / d_total * 100.0) if d_total else 0.0
 
+    # 値は数値のまま保持し、表示桁数は「表示形式」列（Excel の number_format）で指定する
     rows = [
-        {"項目": "解析対象プロジェクト数", "値": n},
-        {"項目": "総脆弱性数(LLM)", "値": total_vuln},
-        {"項目": "総候補フロー数", "値": total_cands},
-        {"項目": "総チェイン数", "値": total_chains},
-        {"項目": "総シンク呼び出し箇所(VD)", "値": total_vds},
-        {"項目": "総関数数", "値": total_funcs},
-        {"項目": "総呼び出しエッジ数", "値": total_edges},
-        {"項目": "総API呼び出し回数(LLM)", "値": total_api_calls},
-        {"項目": "総トークン数", "値": sum_total_toks},
-        {"項目": "平均トークン数/呼び出し", "値": f"{avg_tokens_per_call:.2f}" if avg_tokens_per_call else None},
-        {"項目": "総解析時間(秒)", "値": int(sum_secs) if sum_secs else None},
-        {"項目": "平均解析時間(秒)", "値": f"{avg_secs:.1f}" if avg_secs else None},
-        {"項目": "DITING総件数", "値": d_total},
-        {"項目": "一致件数合計", "値": d_match},
-        {"項目": "一致率(%)", "値": f"{d_rate:.1f}"},
+        {"項目": "解析対象プロジェクト数", "値": n, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総脆弱性数(LLM)", "値": total_vuln, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総候補フロー数", "値": total_cands, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総チェイン数", "値": total_chains, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総シンク呼び出し箇所(VD)", "値": total_vds, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総関数数", "値": total_funcs, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総呼び出しエッジ数", "値": total_edges, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総API呼び出し回数(LLM)", "値": total_api_calls, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "総トークン数", "値": sum_total_toks, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "平均トークン数/呼び出し", "値": avg_tokens_per_call if avg_tokens_per_call else None, OVERVIEW_FORMAT_COL: "0.00"},
+        {"項目": "総解析時間(秒)", "値": int(sum_secs) if sum_secs else None, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "平均解析時間(秒)", "値": avg_secs if avg_secs else None, OVERVIEW_FORMAT_COL: "0.0"},
+        {"項目": "DITING総件数", "値": d_total, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "一致件数合計", "値": d_match, OVERVIEW_FORMAT_COL: "0"},
+        {"項目": "一致率(%)", "値": d_rate, OVERVIEW_FORMAT_COL: "0.0"},
     ]
     return pd.DataFrame(rows)
 
 def build_per_project_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
-    rows = []
-    for p in projects:
-        rows.append({
-            "プロジェクト": p.project_name,
-            "脆弱性数(LLM)": p.vuln_count,
-            "候補フロー数": p.candidate_flows,
-            "チェイン数": p.chains,
-            "シンク呼び出し箇所数(VD)": p.vd_calls,
-            "シンク関数数": p.sinks_count,
-            "関数数": p.defined_functions,
-            "呼び出しエッジ数": p.callgraph_edges,
-            "API呼び出し回数(LLM)": p.api_calls,
-            "総トークン数": p.total_tokens,
-            "解析時間(秒)": int(p.analysis_seconds) if p.analysis_seconds else None,
-            "解析時間(表記)": p.analysis_time_label,
-            "キャッシュ:ヒット数": p.cache_hits,
-            "キャッシュ:ミス数": p.cache_misses,
-            "キャッシュ:ヒット率(%)": p.cache_hit_rate,
-            "DITING件数": p.diting_count,
-            "DITING一致件数": p.match_count,
-            "DITING一致率(%)": f"{p.match_rate:.1f}" if p.match_rate is not None else None,
-            "レポートHTML": str(p.report_html) if p.report_html else None,
-            # time.txt 由来
-            "開始時刻(time.txt)": p.time_start,
-            "終了時刻(time.txt)": p.time_end,
-            "解析時間(秒, time.txt)": int(p.time_seconds) if p.time_seconds else None,
-            "解析時間(表記, time.txt)": p.time_label,
-            "分析モード(time.txt)": p.analysis_mode,
-            "TokenTracking(time.txt)": p.token_tracking,
-        })
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(by=["プロジェクト"]).reset_index(drop=True)
-    return df
+    # 列指向で構築（行ごとの dict を作らず、列単位で一度だけ型推論させる）
+    return pd.DataFrame({
+        "プロジェクト": [p.project_name for p in projects],
+        "脆弱性数(LLM)": [p.vuln_count for p in projects],
+        "候補フロー数": [p.candidate_flows for p in projects],
+        "チェイン数": [p.chains for p in projects],
+        "シンク呼び出し箇所数(VD)": [p.vd_calls for p in projects],
+        "シンク関数数": [p.sinks_count for p in projects],
+        "関数数": [p.defined_functions for p in projects],
+        "呼び出しエッジ数": [p.callgraph_edges for p in projects],
+        "API呼び出し回数(LLM)": [p.api_calls for p in projects],
+        "総トークン数": [p.total_tokens for p in projects],
+        "解析時間(秒)": [int(p.analysis_seconds) if p.analysis_seconds else None for p in projects],
+        "解析時間(表記)": [p.analysis_time_label for p in projects],
+        "キャッシュ:ヒット数": [p.cache_hits for p in projects],
+        "キャッシュ:ミス数": [p.cache_misses for p in projects],
+        "キャッシュ:ヒット率(%)": [p.cache_hit_rate for p in projects],
+        "DITING件数": [p.diting_count for p in projects],
+        "DITING一致件数": [p.match_count for p in projects],
+        "DITING一致率(%)": [f"{p.match_rate:.1f}" if p.match_rate is not None else None for p in projects],
+        "レポートHTML": [str(p.report_html) if p.report_html else None for p in projects],
+        # time.txt 由来
+        "開始時刻(time.txt)": [p.time_start for p in projects],
+        "終了時刻(time.txt)": [p.time_end for p in projects],
+        "解析時間(秒, time.txt)": [int(p.time_seconds) if p.time_seconds else None for p in projects],
+        "解析時間(表記, time.txt)": [p.time_label for p in projects],
+        "分析モード(time.txt)": [p.analysis_mode for p in projects],
+        "TokenTracking(time.txt)": [p.token_tracking for p in projects],
+    })
 
 def build_token_time_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
-    rows = []
-    for p in projects:
-        rows.append({
-            "プロジェクト": p.project_name,
-            "API呼び出し回数(LLM)": p.api_calls,
-            "総トークン数": p.total_tokens,
-            "平均トークン数/呼び出し": (p.total_tokens / p.api_calls) if (p.total_tokens and p.api_calls) else None,
-            "解析時間(秒)": int(p.analysis_seconds) if p.analysis_seconds else None,
-            "解析時間(表記)": p.analysis_time_label,
-            "キャッシュ:ヒット数": p.cache_hits,
-            "キャッシュ:ミス数": p.cache_misses,
-            "キャッシュ:ヒット率(%)": p.cache_hit_rate,
-            # time.txt 由来
-            "開始時刻(time.txt)": p.time_start,
-            "終了時刻(time.txt)": p.time_end,
-            "解析時間(秒, time.txt)": int(p.time_seconds) if p.time_seconds else None,
-            "解析時間(表記, time.txt)": p.time_label,
-            "分析モード(time.txt)": p.analysis_mode,
-            "TokenTracking(time.txt)": p.token_tracking,
-        })
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(by=["プロジェクト"]).reset_index(drop=True)
-    return df
+    # 列指向で構築（行ごとの dict を作らず、列単位で一度だけ型推論させる）
+    return pd.DataFrame({
+        "プロジェクト": [p.project_name for p in projects],
+        "API呼び出し回数(LLM)": [p.api_calls for p in projects],
+        "総トークン数": [p.total_tokens for p in projects],
+        "平均トークン数/呼び出し": [(p.total_tokens / p.api_calls) if (p.total_tokens and p.api_calls) else None for p in projects],
+        "解析時間(秒)": [int(p.analysis_seconds) if p.analysis_seconds else None for p in projects],
+        "解析時間(表記)": [p.analysis_time_label for p in projects],
+        "キャッシュ:ヒット数": [p.cache_hits for p in projects],
+        "キャッシュ:ミス数": [p.cache_misses for p in projects],
+        "キャッシュ:ヒット率(%)": [p.cache_hit_rate for p in projects],
+        # time.txt 由来
+        "開始時刻(time.txt)": [p.time_start for p in projects],
+        "終了時刻(time.txt)": [p.time_end for p in projects],
+        "解析時間(秒, time.txt)": [int(p.time_seconds) if p.time_seconds else None for p in projects],
+        "解析時間(表記, time.txt)": [p.time_label for p in projects],
+        "分析モード(time.txt)": [p.analysis_mode for p in projects],
+        "TokenTracking(time.txt)": [p.token_tracking for p in projects],
+    })
 
 def build_diting_compare_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
-    rows = []
-    for p in projects:
-        rows.append({
-            "プロジェクト": p.project_name,
-            "DITING件数": p.diting_count,
-            "一致件数": p.match_count,
-            "一致率(%)": f"{p.match_rate:.1f}" if p.match_rate is not None else None,
-        })
-    df = pd.DataFrame(rows)
-    if not df.empty:
-        df = df.sort_values(by=["プロジェクト"]).reset_index(drop=True)
-    return df
+    # 列指向で構築（行ごとの dict を作らず、列単位で一度だけ型推論させる）
+    return pd.DataFrame({
+        "プロジェクト": [p.project_name for p in projects],
+        "DITING件数": [p.diting_count for p in projects],
+        "一致件数": [p.match_count for p in projects],
+        "一致率(%)": [f"{p.match_rate:.1f}" if p.match_rate is not None else None for p in projects],
+    })
+
+def _na_last(v: Any) -> Tuple[bool, Any]:
+    """ソートキー: 欠損値を末尾に回す"""
+    return (v is None, "" if v is None else v)
+
+def _line_key(v: Any) -> Tuple[bool, float]:
+    """ソートキー: 行番号を数値として比較（数値化できなければ末尾）"""
+    try:
+        return (False, float(v))
+    except (TypeError, ValueError):
+        return (True, 0.0)
 
 def build_vuln_detail_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
     rows: List[Dict[str, Any]] = []
     for p in projects:
         rows.extend(p.vuln_rows)
-    df = pd.DataFrame(rows, columns=["プロジェクト","ファイル","行","シンク","CWE","深刻度","チェイン"])
-    if not df.empty:
-        if "行" in df.columns:
-            df["行"] = pd.to_numeric(df["行"], errors="coerce").astype("Int64")
-        df = df.sort_values(by=["プロジェクト","ファイル","行","シンク"], na_position="last").reset_index(drop=True)
-    return df
+    # DataFrame を作る前に行リストを並べ替えておき、sort_values による再構築を避ける
+    rows.sort(key=lambda r: (_na_last(r["プロジェクト"]), _na_last(r["ファイル"]),
+                             _line_key(r["行"]), _na_last(r["シンク"])))
+    # 行 dict を pandas に解釈させず、列ごとのリストにしてから渡す
+    cols = ["プロジェクト","ファイル","行","シンク","CWE","深刻度","チェイン"]
+    data: Dict[str, Any] = {c: [r[c] for r in rows] for c in cols}
+    # 行は parse_vuln_json で int/None に正規化済みなので、そのまま Int64 配列として渡す
+    data["行"] = pd.array(data["行"], dtype="Int64")
+    return pd.DataFrame(data)
 
 def build_phase_breakdown_df(projects: List[ProjectMetrics]) -> pd.DataFrame:
     rows: List[Dict[str, Any]] = []
     for p in projects:
         rows.extend(p.phase_rows)
-    df = pd.DataFrame(rows, columns=["プロジェクト","フェーズ","秒(time.txt)","割合%(time.txt)"])
-    if not df.empty:
-        df = df.sort_values(by=["プロジェクト","フェーズ"]).reset_index(drop=True)
-    return df
+    rows.sort(key=lambda r: (r["プロジェクト"], r["フェーズ"]))
+    cols = ["プロジェクト","フェーズ","秒(time.txt)","割合%(time.txt)"]
+    return pd.DataFrame({c: [r[c] for r in rows] for c in cols})
 
 # ------------------------------------------------------------
 # CLI
 # ------------------------------------------------------------
 
+def write_detail_sidecar(df: pd.DataFrame, out: Path, fmt: str) -> bool:
+    """
+    検出詳細を Excel と並べて Feather / Parquet で書き出す（行数が多い場合の高速出力用）。
+    pyarrow が無い等で書けなければ False を返し、呼び出し側は Excel シートに戻す。
+    """
+    sidecar = out.with_suffix(f".detail.{fmt}")
+    try:
+        if fmt == "feather":
+            df.to_feather(sidecar)
+        else:
+            df.to_parquet(sidecar, compression="zstd", index=False)
+    except ImportError as e:
+        print(f"[WARN] 検出詳細を {fmt} で出力できません（{e}）→ Excel シートに出力します")
+        return False
+    print(f"[OK] 検出詳細を出力しました: {sidecar}")
+    return True
+
 def main():
     ap = argparse.ArgumentParser(description="TA解析メトリクスの日本語Excel集計（DITING/line許容・time.txt対応）")
     ap.add_argument("--benchmark-root", type=Path, default=Path("benchmark"), help="benchmark ルートディレクトリ")
     ap.add_argument("--out", type=Path, default=Path("src/metrics/analysis_metrics.xlsx"), help="出力Excelパス")
     ap.add_argument("--diting", type=Path, default=Path("src/metrics/DITING_ans.csv"), help="DITING比較CSV（任意）")
     ap.add_argument("--diting-line-tol", type=int, default=3, help="DITING一致の行番号許容（±N行、既定=3）")
+    ap.add_argument("--no-detail", action="store_true",
+                    help="検出詳細（脆弱性ごとの行）を収集・出力しない")
+    ap.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                    help="プロジェクト収集の並列プロセス数（1 で直列、既定=CPU数）")
+    ap.add_argument("--detail-format", choices=["xlsx", "feather", "parquet"], default="xlsx",
+                    help="検出詳細の出力形式。feather/parquet は Excel とは別の <out>.detail.* に書き出す（既定=xlsx）")
     args = ap.parse_args()
 
     # 1) プロジェクト横断収集
-    projects = scan_results(args.benchmark_root)
+    projects = scan_results(args.benchmark_root, jobs=args.jobs, collect_details=not args.no_detail)
+    # 以降のシートはすべてプロジェクト名順なので、ここで一度だけ並べ替える
+    projects.sort(key=lambda p: p.project_name)
 
     # 2) DITING があれば突合
     diting_df = load_diting_csv(args.diting)
     if diting_df is not None:
-        for p in projects:
-            vd_triplets = extract_vd_triplets(p)  # (file,line,sink?)
-            compute_matches(p, diting_df, vd_triplets, line_tol=args.diting_line_tol)
+        compute_all_matches(projects, diting_df, line_tol=args.diting_line_tol)
 
     # 3) DataFrame 作成（日本語ヘッダ）
     df_overview = build_overview_df(projects)
     df_projects = build_per_project_df(projects)
     df_token = build_token_time_df(projects)
     df_diting = build_diting_compare_df(projects)
-    df_detail = build_vuln_detail_df(projects)
+    df_detail = None if args.no_detail else build_vuln_detail_df(projects)
     df_phase  = build_phase_breakdown_df(projects)
 
     # 4) Excel 出力（日本語シート名 & 列幅自動調整）
     ensure_dir(args.out)
-    with pd.ExcelWriter(args.out, engine="openpyxl") as writer:
-        write_df("概要", df_overview, writer, freeze=None, apply_autofilter=False)
-        write_df("プロジェクト別", df_projects, writer)
-        write_df("トークン・時間", df_token, writer)
-        write_df("DITING比較", df_diting, writer)
-        write_df("検出詳細", df_detail, writer)
+    detail_in_excel = df_detail is not None
+    if detail_in_excel and args.detail_format != "xlsx":
+        detail_in_excel = not write_detail_sidecar(df_detail, args.out, args.detail_format)
+
+    # 行数の多い検出詳細はヘッダだけ書いておき、保存後にセル XML を直接流し込む
+    detail_direct_xml = detail_in_excel and len(df_detail) >= DIRECT_XML_MIN_ROWS
+
+    def write_sheets(book):
+        write_df("概要", df_overview, book, freeze=None, apply_autofilter=False, format_col=OVERVIEW_FORMAT_COL)
+        write_df("プロジェクト別", df_projects, book)
+        write_df("トークン・時間", df_token, book)
+        write_df("DITING比較", df_diting, book)
+        if detail_in_excel:
+            write_df("検出詳細", df_detail, book, data_rows=not detail_direct_xml)
         if not df_phase.empty:
-            write_df("フェーズ内訳(time.txt)", df_phase, writer)
+            write_df("フェーズ内訳(time.txt)", df_phase, book)
+
+    if XLSXWRITER_AVAILABLE:
+        # constant_memory: 行をディスクへ逐次フラッシュし、行数に関わらずメモリを一定に保つ
+        with xlsxwriter.Workbook(str(args.out), {"constant_memory": True}) as book:
+            write_sheets(book)
+    else:
+        # xlsxwriter が無ければ openpyxl の write_only モードで同様に逐次書き出す
+        book = Workbook(write_only=True)
+        write_sheets(book)
+        book.save(args.out)
+    if detail_direct_xml:
+        splice_sheet_rows(args.out, "検出詳細", df_detail)
 
     print(f"[OK] Excel を出力しました: {args.out}")
 
@@ -1,27 +1,98 @@
 # src/parsing/parse_utils.py
 #!/usr/bin/env python3
 """統一されたlibclangパースユーティリティ（データ依存性分析機能付き）"""
+import hashlib
 import json
 import shlex
 import os
+import sys
+import threading
+import weakref
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
 from pathlib import Path
 from clang import cindex
-from clang.cindex import CursorKind, TranslationUnitLoadError
+from clang.cindex import CursorKind, TranslationUnitLoadError, TranslationUnitSaveError
 from typing import Set, Dict, List, Tuple, Optional
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# AST 走査のホットループで使う CursorKind（毎回の属性参照を避ける）
+_CK_FUNCTION_DECL = CursorKind.FUNCTION_DECL
+_CK_CALL_EXPR = CursorKind.CALL_EXPR
+_CK_DECL_REF_EXPR = CursorKind.DECL_REF_EXPR
+_CK_MEMBER_REF_EXPR = CursorKind.MEMBER_REF_EXPR
+_CK_COMPOUND_STMT = CursorKind.COMPOUND_STMT
+_CK_TRANSLATION_UNIT = CursorKind.TRANSLATION_UNIT
+_CK_BINARY_OPERATOR = CursorKind.BINARY_OPERATOR
+_CK_PARM_DECL = CursorKind.PARM_DECL
+_CK_INTEGER_LITERAL = CursorKind.INTEGER_LITERAL
+_CK_STRING_LITERAL = CursorKind.STRING_LITERAL
+_CK_ARRAY_SUBSCRIPT_EXPR = CursorKind.ARRAY_SUBSCRIPT_EXPR
+
+
+# (パス, mtime_ns) -> エントリ一覧。同一実行内での再読込を省く
+_compile_db_cache: Dict[Tuple[str, int], list] = {}
+
 
 def load_compile_db(path: Path) -> list[dict]:
-    """compile_commands.jsonを読み込む"""
-    return json.loads(path.read_text(encoding="utf-8"))
+    """compile_commands.jsonを読み込む（orjson があれば使用、mtime が同じなら再パースしない）"""
+    path = Path(path)
+    key = (str(path.resolve()), path.stat().st_mtime_ns)
+    entries = _compile_db_cache.get(key)
+    if entries is None:
+        data = path.read_bytes()
+        entries = orjson.loads(data) if ORJSON_AVAILABLE else json.loads(data)
+        _compile_db_cache[key] = entries
+    # 呼び出し側がリストを変更してもキャッシュに影響しないようコピーを返す
+    return list(entries)
 
 
 def normalize_compile_args(entry: dict, devkit: str = None, ta_dir: Path = None) -> list[str]:
     """compile_commands.jsonのエントリから正規化された引数リストを生成"""
+    # dict はハッシュできないため、結果に影響する要素だけをキーにして共通実装を呼ぶ
+    # （同じフラグ集合を持つ TU が多いプロジェクトでは実質ユニークなフラグ集合数だけの計算になる）
+    arguments = entry.get("arguments")
+    raw_key = tuple(arguments) if arguments else entry.get("command") or None
+    directory = entry.get("directory")
+    has_directory = "directory" in entry
+    # ソースファイルのパスは ta_dir を推測する場合にしか使われず、その推測は親ディレクトリだけで決まる
+    source_dir = os.path.dirname(entry["file"]) if not ta_dir and not has_directory else None
+    env_devkit = os.environ.get("TA_DEV_KIT_DIR") if not devkit else None
+    return list(_normalize_impl(raw_key, has_directory, directory, source_dir, devkit, ta_dir, env_devkit))
+
+
+@lru_cache(maxsize=None)
+def _path_exists(path: str) -> bool:
+    """同じディレクトリを何度も stat しないよう存在確認をメモ化"""
+    return os.path.exists(path)
+
+
+@lru_cache(maxsize=None)
+def guess_ta_dir(source_dir: str) -> Optional[Path]:
+    """ソースファイルの親ディレクトリから ta/ を含むパスを探す（ディレクトリ単位でメモ化）"""
+    start = Path(source_dir)
+    for parent in (start, *start.parents):
+        if parent.name == "ta":
+            return parent
+    return None
+
+
+@lru_cache(maxsize=None)
+def _normalize_impl(raw_key, has_directory: bool, directory, source_dir,
+                    devkit, ta_dir, env_devkit) -> tuple:
+    """normalize_compile_args の本体（ハッシュ可能な引数でメモ化）"""
     # argumentsまたはcommandから引数を取得
-    raw = entry.get("arguments")
-    if not raw and entry.get("command"):
-        raw = shlex.split(entry["command"])
-    if not raw:
+    if isinstance(raw_key, tuple):
+        raw = list(raw_key)
+    elif raw_key:
+        raw = shlex.split(raw_key)
+    else:
         raw = []
     
     # コンパイラ自体を除去
@@ -33,9 +104,11 @@ def normalize_compile_args(entry: dict, devkit: str = None, ta_dir: Path = None)
     skip_args = {"-c", "-o", "-MT", "-MF", "-MD", "-MP"}
     
     args = []
+    seen = set()    # args のメンバーシップ判定用（線形探索を避ける）
+    has_target = False
     skip_next = False
     
-    for i, arg in enumerate(raw):
+    for arg in raw:
         if skip_next:
             skip_next = False
             continue
@@ -50,57 +123,163 @@ def normalize_compile_args(entry: dict, devkit: str = None, ta_dir: Path = None)
             continue
             
         # 保持する引数
-        if any(arg.startswith(prefix) for prefix in keep_prefixes):
+        if arg.startswith(keep_prefixes):
             args.append(arg)
+            seen.add(arg)
+            if "--target=" in arg:
+                has_target = True
     
     # ターゲットトリプルを追加（ARM向け）
-    if not any("--target=" in arg for arg in args):
+    if not has_target:
         args.append("--target=armv7a-none-eabi")
     
     # TAディレクトリが指定されていない場合、ソースファイルから推測
-    if not ta_dir and "directory" in entry:
-        ta_dir = Path(entry["directory"])
+    if not ta_dir and has_directory:
+        ta_dir = Path(directory)
     elif not ta_dir:
-        source_path = Path(entry["file"])
-        # ta/を含むパスを探す
-        for parent in source_path.parents:
-            if parent.name == "ta":
-                ta_dir = parent
-                break
-    
-    # TAローカルのincludeディレクトリを追加（最優先）
+        ta_dir = guess_ta_dir(source_dir)
+    
+    # 先頭に置くインクルード（優先度を上げる）と末尾に置くインクルードをまとめて作る
+    front = []
+    back = []
+    
+    # TAローカルのincludeディレクトリを追加（最優先）。ta直下 → ta/include の順に並べる
     if ta_dir:
         ta_include = ta_dir / "include"
-        if ta_include.exists():
-            ta_include_arg = f"-I{ta_include}"
-            # 既存の引数リストの先頭に追加（優先度を上げる）
-            if ta_include_arg not in args:
-                args.insert(0, ta_include_arg)
-        
-        # ta直下も追加
-        ta_arg = f"-I{ta_dir}"
-        if ta_arg not in args:
-            args.insert(0, ta_arg)
-    
-    # devkitのインクルードパスを追加
-    if devkit:
-        devkit_include = f"-I{devkit}/include"
-        if devkit_include not in args:
-            args.append(devkit_include)
-    
-    # 環境変数からもdevkitを取得
-    if not devkit and os.environ.get("TA_DEV_KIT_DIR"):
-        devkit_include = f"-I{os.environ['TA_DEV_KIT_DIR']}/include"
-        if devkit_include not in args:
-            args.append(devkit_include)
-    
-    return args
-
-
-def parse_sources_unified(entries: list[dict], devkit: str = None, verbose: bool = False, ta_dir: Path = None):
-    """統一されたソースファイルパース処理"""
-    index = cindex.Index.create()
-    opts = cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
+        candidates = [f"-I{ta_dir}"]
+        if _path_exists(str(ta_include)):
+            candidates.append(f"-I{ta_include}")
+        for inc in candidates:
+            if inc not in seen:
+                front.append(inc)
+                seen.add(inc)
+    
+    # devkitのインクルードパスを追加（引数で未指定なら環境変数から）
+    devkit_root = devkit or env_devkit
+    if devkit_root:
+        devkit_include = f"-I{devkit_root}/include"
+        if devkit_include not in seen:
+            back.append(devkit_include)
+    
+    return (*front, *args, *back)
+
+
+_thread_state = threading.local()
+
+
+def _thread_index() -> cindex.Index:
+    """ワーカースレッドごとに 1 つの cindex.Index を使い回す"""
+    index = getattr(_thread_state, "index", None)
+    if index is None:
+        index = _thread_state.index = cindex.Index.create()
+    return index
+
+
+@lru_cache(maxsize=None)
+def _libclang_stamp() -> str:
+    """読み込まれている libclang の識別子（AST 形式はバージョン依存のためキーに含める）"""
+    name = getattr(cindex.conf.lib, "_name", None) or cindex.conf.get_filename()
+    try:
+        st = os.stat(name)
+        return f"{name}:{st.st_size}:{st.st_mtime_ns}"
+    except (OSError, TypeError):
+        return str(name)
+
+
+def _ast_cache_key(source: str, args: list[str], opts: int) -> Optional[str]:
+    """ソースパス・引数・パースオプション・ソースの mtime・libclang から AST キャッシュのキーを作る"""
+    try:
+        mtime = os.stat(source).st_mtime_ns
+    except OSError:
+        return None
+    h = hashlib.blake2b(digest_size=20)
+    h.update(os.fsencode(os.path.abspath(source)))
+    h.update(repr((tuple(args), opts, mtime, _libclang_stamp())).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _load_cached_ast(cache_dir: Path, key: str):
+    """キャッシュ済み AST を読み込む。ヘッダが更新されていれば None"""
+    ast_path = cache_dir / f"{key}.ast"
+    deps_path = cache_dir / f"{key}.deps.json"
+    if not ast_path.is_file() or not deps_path.is_file():
+        return None
+    try:
+        deps = json.loads(deps_path.read_bytes())
+        for header, mtime in deps.items():
+            if os.stat(header).st_mtime_ns != mtime:
+                return None
+        return cindex.TranslationUnit.from_ast_file(str(ast_path), _thread_index())
+    except (OSError, ValueError, TranslationUnitLoadError):
+        return None
+
+
+def _save_cached_ast(cache_dir: Path, key: str, tu) -> None:
+    """TU とインクルードしたヘッダの mtime を保存（失敗しても解析は続行）"""
+    deps = {}
+    try:
+        for inc in tu.get_includes():
+            header = inc.include.name
+            if header not in deps:
+                deps[header] = os.stat(header).st_mtime_ns
+        # 並列実行中の同一キーに備え、一時ファイルに書いてから置き換える
+        tmp_ast = cache_dir / f"{key}.ast.{threading.get_ident()}.tmp"
+        tu.save(str(tmp_ast))
+        os.replace(tmp_ast, cache_dir / f"{key}.ast")
+        tmp_deps = cache_dir / f"{key}.deps.json.{threading.get_ident()}.tmp"
+        tmp_deps.write_text(json.dumps(deps), encoding="utf-8")
+        os.replace(tmp_deps, cache_dir / f"{key}.deps.json")
+    except (OSError, TranslationUnitSaveError) as e:
+        print(f"[WARN] Failed to cache AST for {tu.spelling}: {e}")
+
+
+def _parse_entry(entry: dict, devkit: str, ta_dir: Path, opts: int, cache_dir: Optional[Path] = None):
+    """1エントリをパース（ワーカースレッドで実行）。失敗時は TU の代わりに例外を返す"""
+    source = entry["file"]
+    args = normalize_compile_args(entry, devkit, ta_dir)
+    key = _ast_cache_key(source, args, opts) if cache_dir else None
+    if key:
+        tu = _load_cached_ast(cache_dir, key)
+        if tu is not None:
+            return source, args, tu
+    try:
+        tu = _thread_index().parse(source, args=args, options=opts)
+    except TranslationUnitLoadError as e:
+        return source, args, e
+    if key:
+        _save_cached_ast(cache_dir, key, tu)
+    return source, args, tu
+
+
+def parse_sources_unified(entries: list[dict], devkit: str = None, verbose: bool = False, ta_dir: Path = None,
+                          max_workers: Optional[int] = None, skip_bodies: bool = False,
+                          cache_dir: Optional[Path] = None, preprocessing_record: bool = False):
+    """
+    統一されたソースファイルパース処理
+    
+    index.parse は ctypes 経由の呼び出し中に GIL を解放するため、TU ごとにスレッドで並列にパースする。
+    TranslationUnit はプロセス間で受け渡せないのでプロセスではなくスレッドを使う。
+    結果と診断表示の順序は entries の順のまま。
+    
+    Args:
+        max_workers: 並列パース数（None なら CPU 数、1 なら逐次）
+        skip_bodies: 関数本体をパースしない軽量モード。宣言・マクロだけが必要な走査向け。
+            本体内の CALL_EXPR は得られず、本体付きの関数も is_definition() が False になる点に注意
+        cache_dir: 指定するとパース済み AST を保存し、ソース・引数・インクルードしたヘッダが
+            変わっていなければ次回以降は再パースせずに読み込む
+        preprocessing_record: マクロ定義・展開などの前処理カーソルを記録する
+            （MACRO_DEFINITION を走査する呼び出し側のみ True にする。メモリとパース時間が増える）
+    """
+    # devkit 未指定時の環境変数参照はエントリごとではなくここで 1 回だけ行う
+    # （main.py が実行時に TA_DEV_KIT_DIR を設定するため import 時には固定しない）
+    if not devkit:
+        devkit = os.environ.get("TA_DEV_KIT_DIR")
+    
+    opts = cindex.TranslationUnit.PARSE_NONE
+    if preprocessing_record:
+        opts |= cindex.TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
+    if skip_bodies:
+        opts |= cindex.TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
     results = []
     
     # インクルードパスの診断情報を表示
@@ -109,46 +288,53 @@ def parse_sources_unified(entries: list[dict], devkit: str = None, verbose: bool
         include_paths = [arg[2:] for arg in sample_args if arg.startswith("-I")]
         print(f"[DEBUG] Include paths:")
         for path in include_paths:
-            exists = Path(path).exists() if path else False
+            exists = _path_exists(path) if path else False
             status = "✓" if exists else "✗"
             print(f"  {status} {path}")
     
-    for entry in entries:
-        source = entry["file"]
-        args = normalize_compile_args(entry, devkit, ta_dir)
-        
-        if verbose:
-            print(f"[DEBUG] Parsing {source}")
-            print(f"  Args: {' '.join(args)}")
-        
-        try:
-            tu = index.parse(source, args=args, options=opts)
+    error_level = cindex.Diagnostic.Error
+    warning_level = cindex.Diagnostic.Warning
+    
+    workers = max(1, min(max_workers or os.cpu_count() or 1, len(entries)))
+    if cache_dir:
+        cache_dir = Path(cache_dir)
+        cache_dir.mkdir(parents=True, exist_ok=True)
+    parse = partial(_parse_entry, devkit=devkit, ta_dir=ta_dir, opts=opts, cache_dir=cache_dir)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for source, args, tu in executor.map(parse, entries):
+            # 出力は TU ごとにまとめて 1 回の write で書き出す（行ごとの print を避ける）
+            lines = []
+            if verbose:
+                lines.append(f"[DEBUG] Parsing {source}\n")
+                lines.append(f"  Args: {' '.join(args)}\n")
+            
+            if isinstance(tu, TranslationUnitLoadError):
+                lines.append(f"[ERROR] Failed to parse {source}: {tu}\n")
+                sys.stdout.write("".join(lines))
+                # エラーでも続行（他のファイルは処理できるかもしれない）
+                continue
             
             # 診断情報の表示
             has_error = False
-            error_count = 0
             warning_count = 0
             
             for diag in tu.diagnostics:
-                if diag.severity >= cindex.Diagnostic.Error:
-                    error_count += 1
+                severity = diag.severity
+                if severity >= error_level:
                     has_error = True
-                elif diag.severity == cindex.Diagnostic.Warning:
+                elif severity == warning_level:
                     warning_count += 1
                 
-                if verbose or diag.severity >= cindex.Diagnostic.Error:
-                    print(f"  [{diag.severity}] {diag.spelling}")
+                if verbose or severity >= error_level:
+                    lines.append(f"  [{severity}] {diag.spelling}\n")
             
             if verbose and not has_error:
-                print(f"  ✓ Parsed successfully (warnings: {warning_count})")
+                lines.append(f"  ✓ Parsed successfully (warnings: {warning_count})\n")
+            if lines:
+                sys.stdout.write("".join(lines))
             
             # エラーがあってもTUは返す（部分的な解析結果が使える場合があるため）
             results.append((source, tu))
-            
-        except TranslationUnitLoadError as e:
-            print(f"[ERROR] Failed to parse {source}: {e}")
-            # エラーでも続行（他のファイルは処理できるかもしれない）
-            continue
     
     return results
 
@@ -157,13 +343,18 @@ def find_function_calls(tu, target_functions: set[str]) -> list[dict]:
     """指定された関数への呼び出しを検索"""
     calls = []
     
-    def walk(cursor, current_func=None):
+    # 再帰の代わりに明示的なスタックで前順走査（深い AST でも RecursionError にならない）
+    stack = [(tu.cursor, None)]
+    while stack:
+        cursor, current_func = stack.pop()
+        kind = cursor.kind
+        
         # 関数定義に入ったら記録
-        if cursor.kind == CursorKind.FUNCTION_DECL and cursor.is_definition():
+        if kind == _CK_FUNCTION_DECL and cursor.is_definition():
             current_func = cursor.spelling
         
         # 関数呼び出しを検出
-        if cursor.kind == CursorKind.CALL_EXPR:
+        elif kind == _CK_CALL_EXPR:
             callee = None
             
             # 呼び出し先の関数名を取得
@@ -172,7 +363,7 @@ def find_function_calls(tu, target_functions: set[str]) -> list[dict]:
             else:
                 # referencedがない場合は子ノードから探す
                 for child in cursor.get_children():
-                    if child.kind == CursorKind.DECL_REF_EXPR:
+                    if child.kind == _CK_DECL_REF_EXPR:
                         callee = child.spelling
                         break
             
@@ -185,11 +376,10 @@ def find_function_calls(tu, target_functions: set[str]) -> list[dict]:
                     "line": cursor.location.line
                 })
         
-        # 子ノードを再帰的に処理
-        for child in cursor.get_children():
-            walk(child, current_func)
+        # 子ノードは逆順に積み、元の再帰と同じ順序で処理する
+        children = list(cursor.get_children())
+        stack.extend((child, current_func) for child in reversed(children))
     
-    walk(tu.cursor)
     return calls
 
 
@@ -199,6 +389,18 @@ class DataFlowAnalyzer:
     def __init__(self, tu):
         self.tu = tu
         self.tainted_vars = set()
+        # 1 回の解析中に同じノードを何度も走査するため、libclang 呼び出し結果をメモ化
+        # （Cursor は clang_equalCursors / clang_hashCursor で比較・ハッシュされる）
+        self._children_cache: Dict[cindex.Cursor, List[cindex.Cursor]] = {}
+        self._variables_cache: Dict[cindex.Cursor, Set[str]] = {}
+    
+    def _children(self, cursor) -> List[cindex.Cursor]:
+        """cursor.get_children() のメモ化版"""
+        children = self._children_cache.get(cursor)
+        if children is None:
+            children = list(cursor.get_children())
+            self._children_cache[cursor] = children
+        return children
         
     def analyze_backward_dataflow(self, func_cursor, sink_location: Tuple[str, int], 
                                  sink_args: List[str]) -> Set[str]:
@@ -214,70 +416,71 @@ class DataFlowAnalyzer:
         Returns:
             関数パラメータのうち、シンクに影響を与えるもののセット
         """
-        # ステップ1: 関数内のすべての文を収集
-        statements = self._collect_statements(func_cursor)
+        # ステップ1・2: シンク位置までの文を収集（シンクより後ろの文は解析に影響しない）
+        # 変数名は sys.intern して集合演算のハッシュ・比較を軽くする
+        statements = self._collect_statements(func_cursor, sink_location)
+        self.tainted_vars = {sys.intern(arg) for arg in sink_args}
         
-        # ステップ2: シンク位置を特定し、初期の汚染変数を設定
-        self.tainted_vars = set(sink_args)
-        sink_found = False
-        
-        # ステップ3: シンク位置から後方に解析
-        for i in range(len(statements) - 1, -1, -1):
-            stmt = statements[i]
-            
-            # シンク位置に到達したか確認
-            if (stmt.location.file and 
-                stmt.location.file.name == sink_location[0] and 
-                stmt.location.line <= sink_location[1]):
-                sink_found = True
-            
-            if not sink_found:
-                continue
-                
-            # データフロー解析（純粋にASTベース）
+        # ステップ3: シンク位置から後方に解析（データフロー解析は純粋にASTベース）
+        for stmt in reversed(statements):
             self._analyze_statement_backward(stmt)
         
         # ステップ4: 関数パラメータとの交差を返す
         func_params = self._get_function_parameters(func_cursor)
+        self._children_cache.clear()
+        self._variables_cache.clear()
         return self.tainted_vars.intersection(func_params)
     
-    def _collect_statements(self, cursor) -> List[cindex.Cursor]:
-        """関数内のすべての文を収集"""
+    def _collect_statements(self, cursor,
+                            sink_location: Optional[Tuple[str, int]] = None) -> List[cindex.Cursor]:
+        """
+        関数内のすべての文を収集
+        
+        sink_location を渡すと、シンクのファイル・行以前にある最後の文までで打ち切る。
+        マクロ展開やインクルードされた断片では前順走査の行番号が単調にならないため、
+        走査は途中で止めずに最後まで行い、収集後に末尾を切り詰める。
+        """
         statements = []
+        last_sink = -1    # シンクのファイル・行以前にある最後の文のインデックス
         
-        def walk(node):
-            # すべての文を順序通りに収集
+        # 関数本体を探索（明示的なスタックで前順に、すべての文を順序通りに収集）
+        stack = [child for child in self._children(cursor) if child.kind == _CK_COMPOUND_STMT]
+        stack.reverse()
+        while stack:
+            node = stack.pop()
+            if sink_location is not None:
+                location = node.location
+                if (location.file and location.file.name == sink_location[0]
+                        and location.line <= sink_location[1]):
+                    last_sink = len(statements)
             statements.append(node)
-            for child in node.get_children():
-                walk(child)
-                
-        # 関数本体を探索
-        for child in cursor.get_children():
-            if child.kind == CursorKind.COMPOUND_STMT:
-                walk(child)
-                
+            stack.extend(reversed(self._children(node)))
+        
+        if sink_location is not None:
+            del statements[last_sink + 1:]
         return statements
     
     def _analyze_statement_backward(self, stmt):
         """文を後方データフロー解析（関数固有のルールなし）"""
-        if stmt.kind == CursorKind.BINARY_OPERATOR:
+        # cursor.kind は参照のたびに libclang を呼ぶので 1 回だけ取得する
+        kind = stmt.kind
+        if kind == _CK_BINARY_OPERATOR:
             # 代入文の可能性
-            tokens = list(stmt.get_tokens())
-            if '=' in [t.spelling for t in tokens]:
+            # トークン列を list 化せず、最初の '=' が見つかった時点で打ち切る
+            if any(t.spelling == '=' for t in stmt.get_tokens()):
                 # 代入の左辺と右辺を識別
-                children = list(stmt.get_children())
+                children = self._children(stmt)
                 if len(children) >= 2:
                     lhs = children[0]
                     rhs = children[1]
                     
-                    lhs_vars = self._collect_variables(lhs)
-                    
                     # 左辺の変数が汚染されている場合、右辺の変数も汚染
-                    if any(var in self.tainted_vars for var in lhs_vars):
-                        rhs_vars = self._collect_variables(rhs)
-                        self.tainted_vars.update(rhs_vars)
+                    # （中間の集合を作らず、汚染変数が見つかった時点で左辺の走査を打ち切る）
+                    tainted = self.tainted_vars
+                    if any(var in tainted for var in self._iter_variables(lhs)):
+                        tainted.update(self._iter_variables(rhs))
                         
-        elif stmt.kind == CursorKind.CALL_EXPR:
+        elif kind == _CK_CALL_EXPR:
             # 関数呼び出し - LLMが後で解析するため、引数の依存性のみ追跡
             self._analyze_function_call_backward(stmt)
     
@@ -285,51 +488,51 @@ class DataFlowAnalyzer:
         """関数呼び出しの引数を後方解析（関数固有のルールなし）"""
         # すべての引数を収集
         arg_vars = set()
-        for child in call_expr.get_children():
+        for child in self._children(call_expr):
             # 最初の子は関数名なのでスキップ
-            if child.kind != CursorKind.DECL_REF_EXPR or not arg_vars:
-                if child.kind != CursorKind.DECL_REF_EXPR:
-                    vars_in_arg = self._collect_variables(child)
-                    arg_vars.update(vars_in_arg)
+            if child.kind != _CK_DECL_REF_EXPR:
+                vars_in_arg = self._collect_variables(child)
+                arg_vars.update(vars_in_arg)
         
         # いずれかの引数が汚染されている場合、すべての引数を汚染
         # （保守的な近似 - LLMが後で正確に判断）
         if any(var in self.tainted_vars for var in arg_vars):
             self.tainted_vars.update(arg_vars)
     
-    def _collect_variables(self, cursor) -> Set[str]:
-        """式から変数名を収集"""
-        variables = set()
+    def _iter_variables(self, cursor):
+        """式に現れる変数名を順に返すジェネレータ（重複あり）"""
+        cached = self._variables_cache.get(cursor)
+        if cached is not None:
+            yield from cached
+            return
         
-        if cursor.kind == CursorKind.DECL_REF_EXPR:
-            variables.add(cursor.spelling)
-        elif cursor.kind == CursorKind.MEMBER_REF_EXPR:
-            # 構造体メンバーも変数として扱う
-            variables.add(cursor.spelling)
-            # ベースオブジェクトも収集
-            for child in cursor.get_children():
-                variables.update(self._collect_variables(child))
-        elif cursor.kind == CursorKind.ARRAY_SUBSCRIPT_EXPR:
-            # 配列アクセス
-            for child in cursor.get_children():
-                variables.update(self._collect_variables(child))
-        elif cursor.kind == CursorKind.UNARY_OPERATOR:
-            # ポインタ参照など
-            for child in cursor.get_children():
-                variables.update(self._collect_variables(child))
-        else:
-            # その他の式は子要素を再帰的に探索
-            for child in cursor.get_children():
-                variables.update(self._collect_variables(child))
-                
+        stack = [cursor]
+        while stack:
+            node = stack.pop()
+            kind = node.kind
+            if kind == _CK_DECL_REF_EXPR:
+                yield sys.intern(node.spelling)
+                continue
+            if kind == _CK_MEMBER_REF_EXPR:
+                # 構造体メンバーも変数として扱う（ベースオブジェクトも続けて収集）
+                yield sys.intern(node.spelling)
+            # 配列アクセス・ポインタ参照・その他の式は子要素を探索
+            stack.extend(self._children(node))
+    
+    def _collect_variables(self, cursor) -> Set[str]:
+        """式から変数名を収集（同じ式の再問い合わせは解析中キャッシュから返す）"""
+        variables = self._variables_cache.get(cursor)
+        if variables is None:
+            variables = set(self._iter_variables(cursor))
+            self._variables_cache[cursor] = variables
         return variables
     
     def _get_function_parameters(self, func_cursor) -> Set[str]:
         """関数のパラメータ名を取得"""
         params = set()
-        for child in func_cursor.get_children():
-            if child.kind == CursorKind.PARM_DECL:
-                params.add(child.spelling)
+        for child in self._children(func_cursor):
+            if child.kind == _CK_PARM_DECL:
+                params.add(sys.intern(child.spelling))
         return params
 
 
@@ -384,19 +587,75 @@ def analyze_interprocedural_dataflow(tu, vd: dict, call_graph: dict) -> List[Lis
     return chains
 
 
+# TU -> {ファイル名: (開始行リスト, [(開始行, 終了行, 関数カーソル), ...])}
+_func_index_cache: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def _build_func_index(tu) -> Dict[str, Tuple[List[int], List[tuple]]]:
+    """TU 内の関数定義をファイルごとに開始行でソートした区間インデックスを作る"""
+    by_file: Dict[str, List[tuple]] = {}
+    order = 0
+    stack = list(tu.cursor.get_children())
+    stack.reverse()
+    while stack:
+        node = stack.pop()
+        if node.kind == _CK_FUNCTION_DECL:
+            if node.is_definition() and node.location.file:
+                extent = node.extent
+                by_file.setdefault(node.location.file.name, []).append(
+                    (extent.start.line, order, extent.end.line, node))
+                order += 1
+            # C では関数本体の中に関数定義は現れないので降りない
+            continue
+        # extern "C" { ... } などの中の定義も拾う
+        children = list(node.get_children())
+        children.reverse()
+        stack.extend(children)
+    
+    index = {}
+    for file_name, items in by_file.items():
+        # 同じ開始行が並ぶ場合は走査順で先のものが末尾に来るようにする
+        items.sort(key=lambda t: (t[0], -t[1]))
+        index[file_name] = ([t[0] for t in items], [(t[0], t[2], t[3]) for t in items])
+    return index
+
+
+def _get_func_index(tu) -> Dict[str, Tuple[List[int], List[tuple]]]:
+    index = _func_index_cache.get(tu)
+    if index is None:
+        index = _build_func_index(tu)
+        _func_index_cache[tu] = index
+    return index
+
+
 def _find_function_containing_location(cursor, file_path: str, line: int):
     """指定された位置を含む関数を見つける"""
-    for child in cursor.get_children():
-        if child.kind == CursorKind.FUNCTION_DECL and child.is_definition():
+    if cursor.kind == _CK_TRANSLATION_UNIT:
+        # TU 全体が対象なら、TU ごとに一度だけ作るインデックスを二分探索
+        entry = _get_func_index(cursor.translation_unit).get(file_path)
+        if not entry:
+            return None
+        starts, items = entry
+        # 関数定義の区間は重ならないので、開始行が line 以下で最後のものだけ調べればよい
+        i = bisect_right(starts, line) - 1
+        if i >= 0 and line <= items[i][1]:
+            return items[i][2]
+        return None
+    
+    # 明示的なスタックで前順に探索（再帰版と同じ順序で最初に見つかった関数を返す）
+    stack = list(cursor.get_children())
+    stack.reverse()
+    while stack:
+        child = stack.pop()
+        if child.kind == _CK_FUNCTION_DECL and child.is_definition():
             if (child.location.file and 
                 child.location.file.name == file_path and
                 child.extent.start.line <= line <= child.extent.end.line):
                 return child
         
-        # 再帰的に探索
-        result = _find_function_containing_location(child, file_path, line)
-        if result:
-            return result
+        children = list(child.get_children())
+        children.reverse()
+        stack.extend(children)
     
     return None
 
@@ -404,36 +663,52 @@ def _find_function_containing_location(cursor, file_path: str, line: int):
 def _trace_callers_recursive(current_func: str, tainted_params: Set[str], 
                            call_graph: dict, path: List[str], 
                            chains: List[List[str]], max_depth: int):
-    """呼び出し元を再帰的に追跡（保守的な近似）"""
+    """
+    呼び出し元を追跡（保守的な近似）
+    
+    Python の再帰ではなく、(関数, 呼び出し元イテレータ) の明示的なスタックで深さ優先に辿る。
+    経路上の関数は集合でも保持し、循環判定を O(1) で行う。チェーンの出力順は再帰版と同じ。
+    tainted_params は保守的にすべてのパラメータを伝播する前提のため経路選択には使わない
+    （LLMが後で正確な依存関係を判断）。
+    """
     if len(path) > max_depth:
         return
     
-    # 現在の関数の呼び出し元を探す
     callers = call_graph.get(current_func, [])
-    
     if not callers:
         # エントリポイントに到達
         chains.append(path[:])
         return
     
-    for caller_info in callers:
+    path = list(path)
+    on_path = set(path)
+    stack = [iter(callers)]
+    
+    while stack:
+        caller_info = next(stack[-1], None)
+        if caller_info is None:
+            # この関数の呼び出し元をすべて辿り終えたので一段戻る
+            stack.pop()
+            if len(stack) > 0:
+                on_path.discard(path.pop())
+            continue
+        
         caller_name = caller_info["caller"]
         
-        # 循環を防ぐ
-        if caller_name in path:
+        # 循環を防ぐ / 深さ制限を超える経路は辿らない
+        if caller_name in on_path or len(path) + 1 > max_depth:
             continue
         
-        # 保守的な近似：データ依存の可能性がある呼び出し元をすべて追跡
-        # LLMが後で正確な依存関係を判断
-        new_path = path + [caller_name]
-        _trace_callers_recursive(
-            caller_name, 
-            tainted_params,  # 保守的にすべてのパラメータを伝播
-            call_graph,
-            new_path,
-            chains,
-            max_depth
-        )
+        path.append(caller_name)
+        callers = call_graph.get(caller_name)
+        if not callers:
+            # エントリポイントに到達
+            chains.append(path[:])
+            path.pop()
+            continue
+        
+        on_path.add(caller_name)
+        stack.append(iter(callers))
 
 def extract_function_call_arguments(cursor, file_path: str, line: int, func_name: str) -> List[str]:
     """
@@ -450,7 +725,7 @@ def extract_function_call_arguments(cursor, file_path: str, line: int, func_name
     """
     def find_call_at_location(node):
         # 指定された位置の関数呼び出しを探す
-        if (node.kind == CursorKind.CALL_EXPR and
+        if (node.kind == _CK_CALL_EXPR and
             node.location.file and
             node.location.file.name == file_path and
             node.location.line == line):
@@ -461,7 +736,7 @@ def extract_function_call_arguments(cursor, file_path: str, line: int, func_name
                 called_func = node.referenced.spelling
             else:
                 for child in node.get_children():
-                    if child.kind == CursorKind.DECL_REF_EXPR:
+                    if child.kind == _CK_DECL_REF_EXPR:
                         called_func = child.spelling
                         break
             
@@ -470,7 +745,7 @@ def extract_function_call_arguments(cursor, file_path: str, line: int, func_name
                 args = []
                 for child in node.get_children():
                     # 最初の子は通常関数名なのでスキップ
-                    if child.kind == CursorKind.DECL_REF_EXPR and not args and child.spelling == func_name:
+                    if child.kind == _CK_DECL_REF_EXPR and not args and child.spelling == func_name:
                         continue
                     # 引数を収集
                     arg_expr = extract_expression_text(child)
@@ -489,40 +764,84 @@ def extract_function_call_arguments(cursor, file_path: str, line: int, func_name
     result = find_call_at_location(cursor)
     return result if result is not None else []
 
+# 生テキストからトークン連結と同じ文字列を作れない要素（リテラル・コメント・行継続）
+_RAW_TEXT_FALLBACK_MARKERS = (b'"', b"'", b"\\", b"//", b"/*")
+
+
+@lru_cache(maxsize=128)
+def _read_source_bytes(path: str) -> Optional[bytes]:
+    """ソースファイルの内容をファイル単位でキャッシュして返す"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _tokens_source_text(tokens) -> Optional[str]:
+    """
+    先頭・末尾トークンの範囲をソースから直接切り出し、トークン連結と同じ文字列を返す。
+    トークンごとの spelling 取得（FFI 呼び出し）を避けるための高速経路で、
+    同じ結果を保証できない場合は None
+    """
+    start = tokens[0].extent.start
+    end = tokens[-1].extent.end
+    if not start.file or not end.file or start.file.name != end.file.name:
+        return None
+    if end.offset <= start.offset:
+        return None
+    data = _read_source_bytes(start.file.name)
+    if data is None:
+        return None
+    raw = data[start.offset:end.offset]
+    if any(marker in raw for marker in _RAW_TEXT_FALLBACK_MARKERS):
+        return None
+    try:
+        text = raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+    # リテラル・コメントを含まなければ空白はトークン区切りにしか現れない
+    return "".join(text.split())
+
+
 def extract_expression_text(cursor) -> str:
     """
     カーソルから式のテキスト表現を抽出
-    トークンを使って正確なテキストを再構築
+    トークンを使って正確なテキストを再構築（可能ならトークン範囲のソースを直接読む）
     """
     tokens = list(cursor.get_tokens())
     if tokens:
         # トークンから式を再構築
+        text = _tokens_source_text(tokens)
+        if text is not None:
+            return text
         return ''.join(token.spelling for token in tokens)
     
     # トークンがない場合は基本的な情報から推測
-    if cursor.kind == CursorKind.DECL_REF_EXPR:
+    kind = cursor.kind
+    if kind == _CK_DECL_REF_EXPR:
         return cursor.spelling
-    elif cursor.kind == CursorKind.INTEGER_LITERAL:
+    elif kind == _CK_INTEGER_LITERAL:
         # 整数リテラル
         return cursor.spelling if cursor.spelling else "0"
-    elif cursor.kind == CursorKind.STRING_LITERAL:
+    elif kind == _CK_STRING_LITERAL:
         # 文字列リテラル
         return cursor.spelling if cursor.spelling else '""'
-    elif cursor.kind == CursorKind.MEMBER_REF_EXPR:
+    elif kind == _CK_MEMBER_REF_EXPR:
         # 構造体メンバー参照
         base = ""
         for child in cursor.get_children():
             base = extract_expression_text(child)
             break
         return f"{base}.{cursor.spelling}" if base else cursor.spelling
-    elif cursor.kind == CursorKind.ARRAY_SUBSCRIPT_EXPR:
+    elif kind == _CK_ARRAY_SUBSCRIPT_EXPR:
         # 配列アクセス
         children = list(cursor.get_children())
         if len(children) >= 2:
             array = extract_expression_text(children[0])
             index = extract_expression_text(children[1])
             return f"{array}[{index}]"
-    elif cursor.kind == CursorKind.CALL_EXPR:
+    elif kind == _CK_CALL_EXPR:
         # 関数呼び出し
         func_name = ""
         args = []
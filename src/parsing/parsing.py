@@ -2,66 +2,170 @@
 #!/usr/bin/env python3
 """libclang ベースの AST 抽出ユーティリティ（ホワイトリスト方式）"""
 from __future__ import annotations
-import json
+import os
+import weakref
+from itertools import islice
 from pathlib import Path
-from clang import cindex
+from typing import Optional
 from clang.cindex import CursorKind, TranslationUnit
 
 # 新しい統一されたパースユーティリティを使用
 from .parse_utils import load_compile_db as _load_compile_db
-from .parse_utils import parse_sources_unified
+from .parse_utils import parse_sources_unified, guess_ta_dir
 
 # 既存のインターフェースを維持
 def load_compile_commands(path: str) -> list[dict]:
     return _load_compile_db(Path(path))
 
 
-def parse_sources(entries: list[dict]) -> list[tuple[str, TranslationUnit]]:
-    """既存のインターフェースを維持しつつ、新しい実装を使用"""
+def parse_sources(entries: list[dict], jobs: Optional[int] = None,
+                  cache_dir: Optional[Path] = None, verbose: bool = False) -> list[tuple[str, TranslationUnit]]:
+    """
+    既存のインターフェースを維持しつつ、新しい実装を使用
+    
+    jobs: 並列パース数（None なら CPU 数）。TU はスレッドで並列にパースされる
+    cache_dir: 指定するとパース済み AST をディスクに保存し、ソース・引数・ヘッダが
+        変わっていない TU は次回以降再パースせずに読み込む
+    verbose: TU ごとの [DEBUG] 出力（引数・全診断）を表示する。エラー診断は常に表示
+    """
     # 環境変数からdevkitを取得
-    import os
     devkit = os.environ.get("TA_DEV_KIT_DIR")
     
-    # TAディレクトリを推定（最初のエントリから）
+    # TAディレクトリを推定（最初のエントリの directory 自身とその親から ta/ を探す）
     ta_dir = None
     if entries and "directory" in entries[0]:
-        dir_path = Path(entries[0]["directory"])
-        # ta/を含むパスを探す
-        for parent in [dir_path] + list(dir_path.parents):
-            if parent.name == "ta":
-                ta_dir = parent
-                break
+        ta_dir = guess_ta_dir(entries[0]["directory"])
     
-    # 統一されたパース関数を使用
-    return parse_sources_unified(entries, devkit, verbose=True, ta_dir=ta_dir)
+    # 統一されたパース関数を使用（extract_functions がマクロ定義を拾うため前処理レコードを有効にする）
+    return parse_sources_unified(entries, devkit, verbose=verbose, ta_dir=ta_dir, preprocessing_record=True,
+                                 max_workers=jobs, cache_dir=cache_dir)
+
+
+# AST 走査のホットループで使う CursorKind（毎回の属性参照を避ける）
+_CK_FUNCTION_DECL = CursorKind.FUNCTION_DECL
+_CK_MACRO_DEFINITION = CursorKind.MACRO_DEFINITION
+
+# 走査ループでは Cursor 構造体の _kind_id（整数フィールド）を直接比較する。
+# cursor.kind は毎回 CursorKind.from_id を経由するため、整数比較の方が軽い
+_KIND_FUNCTION_DECL = CursorKind.FUNCTION_DECL.value
+_KIND_MACRO_DEFINITION = CursorKind.MACRO_DEFINITION.value
+
+# FUNCTION_DECL を含み得るノードだけを降りる（式・型定義・変数初期化子などの部分木は走査しない）。
+# C では関数宣言はファイルスコープかブロックスコープ（関数本体の文の中）にしか現れない
+_DESCEND_KINDS = frozenset({
+    CursorKind.FUNCTION_DECL,
+    CursorKind.COMPOUND_STMT,
+    CursorKind.DECL_STMT,
+    CursorKind.IF_STMT,
+    CursorKind.FOR_STMT,
+    CursorKind.WHILE_STMT,
+    CursorKind.DO_STMT,
+    CursorKind.SWITCH_STMT,
+    CursorKind.CASE_STMT,
+    CursorKind.DEFAULT_STMT,
+    CursorKind.LABEL_STMT,
+    CursorKind.LINKAGE_SPEC,
+    CursorKind.UNEXPOSED_DECL,
+    CursorKind.NAMESPACE,
+})
+_DESCEND_KIND_IDS = frozenset(kind.value for kind in _DESCEND_KINDS)
+
+
+# TU -> {CursorKind: [宣言 dict, ...]}（出現順）。TU ごとに走査は 1 回だけ
+_decl_index: "weakref.WeakKeyDictionary[TranslationUnit, dict]" = weakref.WeakKeyDictionary()
 
 
 def extract_functions(tu: TranslationUnit) -> list[dict]:
-    """関数定義と宣言、マクロを抽出"""
-    decls: list[dict] = []
+    """関数定義と宣言、マクロを抽出（同じ TU の 2 回目以降は走査結果を再利用）"""
+    index = _get_decl_index(tu)
+    return list(index["all"])
+
+
+def iter_declarations(tu: TranslationUnit):
+    """
+    extract_functions と同じ宣言を出現順に 1 件ずつ返すジェネレータ
     
-    def walk(node):
-        for ch in node.get_children():
-            if ch.kind == CursorKind.FUNCTION_DECL:
-                decls.append({
-                    "kind": "function",
-                    "name": ch.spelling,
-                    "file": ch.location.file.name if ch.location.file else None,
-                    "line": ch.location.line,
-                    "is_definition": ch.is_definition(),
-                })
-            elif ch.kind == CursorKind.MACRO_DEFINITION:
-                toks = list(ch.get_tokens())
-                if len(toks) > 1 and toks[1].spelling == "(":
-                    params = [t.spelling for t in toks[2:] if t.spelling.isidentifier()]
-                    decls.append({
-                        "kind": "macro",
-                        "name": ch.spelling,
-                        "file": ch.location.file.name if ch.location.file else None,
-                        "line": ch.location.line,
-                        "params": params,
-                    })
-            walk(ch)
+    走査済みの TU はインデックスから返す。未走査なら AST を辿りながら逐次返し、
+    最後まで消費された場合だけ結果をインデックスに登録する
+    """
+    index = _decl_index.get(tu)
+    if index is not None:
+        yield from index["all"]
+        return
+    decls = []
+    for decl in _walk_declarations(tu):
+        decls.append(decl)
+        yield decl
+    _decl_index[tu] = _build_decl_index(decls)
+
+
+def extract_by_kind(tu: TranslationUnit, kind: CursorKind) -> list[dict]:
+    """
+    指定した種類の宣言だけを返す（FUNCTION_DECL / MACRO_DEFINITION）
+    
+    extract_functions と同じ走査結果を種類別に引くだけなので、追加の AST 走査は発生しない
+    """
+    index = _get_decl_index(tu)
+    if kind not in index:
+        raise ValueError(f"unsupported cursor kind: {kind}")
+    return list(index[kind])
+
+
+def _get_decl_index(tu: TranslationUnit) -> dict:
+    index = _decl_index.get(tu)
+    if index is None:
+        index = _build_decl_index(list(_walk_declarations(tu)))
+        _decl_index[tu] = index
+    return index
+
+
+def _build_decl_index(decls: list[dict]) -> dict:
+    return {
+        "all": decls,
+        _CK_FUNCTION_DECL: [d for d in decls if d["kind"] == "function"],
+        _CK_MACRO_DEFINITION: [d for d in decls if d["kind"] == "macro"],
+    }
+
+
+def _walk_declarations(tu: TranslationUnit):
+    """TU を 1 回走査して関数宣言・定義と関数マクロを出現順に yield する"""
     
-    walk(tu.cursor)
-    return decls
\ No newline at end of file
+    # 再帰の代わりに明示的なスタックで前順走査（子は逆順に積んで元の出現順を保つ）
+    # 宣言を含み得ない部分木は枝刈りする
+    stack = list(tu.cursor.get_children())
+    stack.reverse()
+    while stack:
+        ch = stack.pop()
+        kind_id = ch._kind_id
+        if kind_id == _KIND_FUNCTION_DECL:
+            # location / file は参照のたびに libclang を呼ぶので 1 回だけ取得する
+            loc = ch.location
+            f = loc.file
+            yield {
+                "kind": "function",
+                "name": ch.spelling,
+                "file": f.name if f else None,
+                "line": loc.line,
+                "is_definition": ch.is_definition(),
+            }
+        elif kind_id == _KIND_MACRO_DEFINITION:
+            # 先頭 2 トークンだけで関数マクロか判定し、残りは同じイテレータから遅延して読む
+            toks = ch.get_tokens()
+            head = list(islice(toks, 2))
+            if len(head) > 1 and head[1].spelling == "(":
+                params = [sp for t in toks if (sp := t.spelling).isidentifier()]
+                loc = ch.location
+                f = loc.file
+                yield {
+                    "kind": "macro",
+                    "name": ch.spelling,
+                    "file": f.name if f else None,
+                    "line": loc.line,
+                    "params": params,
+                }
+            continue
+        if kind_id not in _DESCEND_KIND_IDS:
+            continue
+        children = list(ch.get_children())
+        children.reverse()
+        stack.extend(children)
\ No newline at end of file
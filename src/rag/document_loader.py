@@ -6,17 +6,62 @@ ChromaDB対応のメタデータ正規化を含む
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 import hashlib
 import json
+import mmap
+import pickle
+import re
 from datetime import datetime
+from functools import partial
 
 # PDFテキスト抽出ライブラリ
 import PyPDF2
 import pdfplumber
+
+# PyMuPDF（MuPDF の C 実装でテキスト抽出が pdfplumber より大幅に速い）
+try:
+    import fitz
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    PYMUPDF_AVAILABLE = False
+
+# BLAKE3（SIMD 実装で MD5 より高速。変更検出にしか使わないので暗号強度は問わない）
+try:
+    import blake3
+    BLAKE3_AVAILABLE = True
+except ImportError:
+    BLAKE3_AVAILABLE = False
+
 from langchain_core.documents import Document
 
+# ファイルハッシュ計算時の読み込み単位
+_HASH_CHUNK_SIZE = 1 << 20
+
+# キャッシュに記録するハッシュアルゴリズム（hash_algo のない古いエントリは md5 とみなす）
+_HASH_ALGO = "blake3" if BLAKE3_AVAILABLE else "md5"
+
+# キャッシュ本体（ページテキストとメタデータ）の pickle プロトコル
+_PICKLE_PROTOCOL = 5
+
+# セクション番号のパターン（ページごとに使うのでモジュール読み込み時にコンパイルしておく）
+_SECTION_PATTERNS = [re.compile(p) for p in (
+    r'^\d+\.\d+',  # 1.1, 2.3 など
+    r'^Chapter \d+',
+    r'^Section \d+',
+    r'^Appendix [A-Z]',
+)]
+
+# TEE API関数のパターン（ドキュメントタイプ別）。
+# 接頭辞を 1 つの選択にまとめてページ本文を 1 回だけ走査し、キャプチャで関数名だけを取り出す
+_API_PATTERNS = {
+    "TEE_Internal_API": re.compile(r'\b((?:TEE|TA)_[A-Za-z][A-Za-z0-9_]*)\s*\('),
+    "TEE_Client_API": re.compile(r'\b(TEEC_[A-Za-z][A-Za-z0-9_]*)\s*\('),
+}
+
+
 def sanitize_metadata_for_chroma(metadata: Dict[str, Any]) -> Dict[str, Any]:
     """
     メタデータをChromaDB対応形式に正規化
@@ -73,29 +118,147 @@ class TEEDocumentLoader:
         self.documents_dir.mkdir(parents=True, exist_ok=True)
         
         # メタデータキャッシュ
-        self.cache_file = self.documents_dir / ".document_cache.json"
+        # 1 行 1 エントリの追記ログ（同じ file_name は後の行が有効）。
+        # ページ本文は blob_file に pickle で追記し、ログには位置（blob_offset / blob_len）だけを残す
+        self.cache_file = self.documents_dir / ".document_cache.jsonl"
+        self.blob_file = self.documents_dir / ".document_cache.blob.pkl"
+        self._legacy_cache_file = self.documents_dir / ".document_cache.json"
+        self._cache_log_records = 0
+        self._blob_mm: Optional[mmap.mmap] = None
         self.cache = self._load_cache()
+        # ハッシュ計算時点のファイル状態（file_name -> (size, mtime_ns)）。キャッシュ登録時に記録する
+        self._file_stats: Dict[str, Tuple[int, int]] = {}
     
     def _load_cache(self) -> Dict[str, Any]:
-        """キャッシュファイルを読み込む"""
+        """キャッシュファイルを読み込む（追記ログを先頭から再生し、file_name ごとに最後の行を採用）"""
         if self.cache_file.exists():
+            cache = {}
+            try:
+                with open(self.cache_file, encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            record = json.loads(line)
+                        except ValueError:
+                            continue  # 書き込み途中で中断した行などは読み飛ばす
+                        if not isinstance(record, dict):
+                            continue
+                        file_name = record.pop("file_name", None)
+                        if file_name is None:
+                            continue
+                        cache[file_name] = record
+                        self._cache_log_records += 1
+            except OSError:
+                return {}
+            return cache
+        
+        # 旧形式（辞書全体を 1 つの JSON に保存）からの移行
+        if self._legacy_cache_file.exists():
             try:
-                return json.loads(self.cache_file.read_text(encoding="utf-8"))
+                cache = json.loads(self._legacy_cache_file.read_text(encoding="utf-8"))
             except:
                 return {}
+            if not isinstance(cache, dict):
+                return {}
+            self.cache = cache
+            self._compact_cache()
+            return self.cache
         return {}
     
-    def _save_cache(self):
-        """キャッシュを保存"""
-        self.cache_file.write_text(
-            json.dumps(self.cache, indent=2, ensure_ascii=False),
-            encoding="utf-8"
-        )
+    def _append_cache(self, file_name: str):
+        """1 ファイル分のキャッシュエントリをログに追記する"""
+        record = {"file_name": file_name, **self.cache[file_name]}
+        with open(self.cache_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._cache_log_records += 1
+        
+        # 上書きされた古い行が有効な行より多くなったら詰め直す
+        if self._cache_log_records > 2 * len(self.cache):
+            self._compact_cache()
+    
+    def _compact_cache(self):
+        """
+        メモリ上のキャッシュからログと本体ファイルを書き直す（一時ファイル経由で置き換え）
+        
+        上書きされたエントリの本体を取り除き、旧形式でログに埋め込まれていた documents も本体ファイルへ移す。
+        旧形式のメタデータは正規化前の値（リスト・辞書）を含み得るので、移す時点で 1 回だけ正規化する
+        """
+        tmp_file = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        tmp_blob = self.blob_file.with_name(self.blob_file.name + ".tmp")
+        compacted = {}
+        with open(tmp_file, "w", encoding="utf-8") as f, open(tmp_blob, "wb") as blob:
+            for file_name, info in self.cache.items():
+                try:
+                    if "documents" in info:
+                        pages = _legacy_pages(info)
+                        payload = pickle.dumps(pages, protocol=_PICKLE_PROTOCOL)
+                        info = {k: v for k, v in info.items() if k != "documents"}
+                        info["api_functions_count"] = _count_api_functions(metadata for _, metadata in pages)
+                    else:
+                        payload = self._entry_payload(info)
+                except (OSError, ValueError, KeyError, TypeError, AttributeError):
+                    continue  # 本体を読めない・形式が壊れたエントリは捨てる（次回は再読み込みになる）
+                info["blob_offset"] = blob.tell()
+                info["blob_len"] = len(payload)
+                blob.write(payload)
+                compacted[file_name] = info
+                f.write(json.dumps({"file_name": file_name, **info}, ensure_ascii=False) + "\n")
+        self._close_blob()
+        os.replace(tmp_blob, self.blob_file)
+        os.replace(tmp_file, self.cache_file)
+        self.cache = compacted
+        self._cache_log_records = len(self.cache)
+    
+    def _entry_payload(self, info: Dict[str, Any]) -> bytes:
+        """エントリのページ本体を pickle 済みのバイト列で返す"""
+        if "documents" in info:
+            return pickle.dumps(_legacy_pages(info), protocol=_PICKLE_PROTOCOL)
+        return self._read_blob(info["blob_offset"], info["blob_len"])
+    
+    def _read_blob(self, offset: int, length: int) -> bytes:
+        """本体ファイルの指定範囲を読む（ファイルは mmap で開き、必要な範囲だけをコピーする）"""
+        end = offset + length
+        if self._blob_mm is None or len(self._blob_mm) < end:
+            # 初回、または追記でファイルが伸びた後は開き直す
+            self._close_blob()
+            with open(self.blob_file, "rb") as f:
+                self._blob_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = self._blob_mm[offset:end]
+        if len(data) != length:
+            raise ValueError(f"truncated cache blob: {self.blob_file}")
+        return data
+    
+    def _close_blob(self):
+        if self._blob_mm is not None:
+            self._blob_mm.close()
+            self._blob_mm = None
     
     def _get_file_hash(self, file_path: Path) -> str:
-        """ファイルのハッシュ値を計算"""
+        """
+        ファイルのハッシュ値を計算
+        
+        サイズと更新時刻がキャッシュの記録と一致する場合は再計算せずに記録済みのハッシュを返す。
+        計算する場合もファイル全体を読み込まず、チャンク単位で更新する
+        """
+        st = file_path.stat()
+        file_stat = (st.st_size, st.st_mtime_ns)
+        self._file_stats[file_path.name] = file_stat
+        
+        entry = self.cache.get(file_path.name)
+        if (entry and entry.get("hash") and entry.get("hash_algo", "md5") == _HASH_ALGO
+                and (entry.get("size"), entry.get("mtime_ns")) == file_stat):
+            return entry["hash"]
+        
         with open(file_path, "rb") as f:
-            return hashlib.md5(f.read()).hexdigest()
+            if BLAKE3_AVAILABLE:
+                h = blake3.blake3()
+            elif hasattr(hashlib, "file_digest"):
+                # Python 3.11+ は読み込みループごと C 側で処理する
+                return hashlib.file_digest(f, _HASH_ALGO).hexdigest()
+            else:
+                h = hashlib.new(_HASH_ALGO)
+            for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b""):
+                h.update(chunk)
+        return h.hexdigest()
     
     def load_pdf_with_metadata(self, pdf_path: Path) -> List[Document]:
         """
@@ -107,117 +270,180 @@ class TEEDocumentLoader:
         Returns:
             List[Document]: ページごとのDocumentオブジェクトのリスト
         """
+        return list(self.iter_pdf_documents(pdf_path))
+    
+    def iter_pdf_documents(self, pdf_path: Path) -> Iterator[Document]:
+        """
+        PDFのページごとのDocumentを順に返すジェネレータ
+        
+        キャッシュヒット時は Document を 1 ページずつ作るので、呼び出し側がストリーミングで
+        処理すれば全ページ分の Document を同時に保持せずに済む
+        
+        Args:
+            pdf_path: PDFファイルのパス
+        """
         file_hash = self._get_file_hash(pdf_path)
         file_name = pdf_path.name
         
         # キャッシュチェック
-        if file_name in self.cache and self.cache[file_name].get("hash") == file_hash:
-            print(f"[INFO] Using cached content for {file_name}")
-            cached_docs = self.cache[file_name].get("documents", [])
-            # キャッシュされたドキュメントのメタデータを正規化
-            documents = []
-            for doc_data in cached_docs:
-                sanitized_metadata = sanitize_metadata_for_chroma(doc_data["metadata"])
-                doc = Document(
-                    page_content=doc_data["page_content"],
-                    metadata=sanitized_metadata
-                )
-                documents.append(doc)
-            return documents
+        if self._has_cached_documents(file_name, file_hash):
+            cached = self._iter_cached_documents(file_name)
+            if cached is not None:
+                yield from cached
+                return
         
-        print(f"[INFO] Loading PDF: {pdf_path}")
+        yield from self._collect_loaded_pdf(pdf_path, file_hash, partial(_load_one_pdf, pdf_path))
+    
+    def _has_cached_documents(self, file_name: str, file_hash: str) -> bool:
+        """ハッシュが一致するキャッシュエントリがあるか（本体は読まない）"""
+        entry = self.cache.get(file_name)
+        return bool(entry) and entry.get("hash_algo", "md5") == _HASH_ALGO and entry.get("hash") == file_hash
+    
+    def _iter_cached_documents(self, file_name: str) -> Optional[Iterator[Document]]:
+        """キャッシュから Document を 1 ページずつ返すイテレータ（エントリが無い・本体を読めない場合は None）"""
+        # ヒット判定の後に圧縮で捨てられたエントリはキャッシュミスとして扱う
+        entry = self.cache.get(file_name)
+        if entry is None:
+            return None
+        # このファイルの範囲だけを読み出して復元する
+        try:
+            pages = pickle.loads(self._entry_payload(entry))
+        except (OSError, ValueError, EOFError, KeyError, TypeError, AttributeError,
+                pickle.UnpicklingError) as e:
+            print(f"[WARN] Cached content for {file_name} is unreadable, reloading: {e}")
+            return None
+        print(f"[INFO] Using cached content for {file_name}")
+        # 本体のメタデータは保存前に正規化済み（旧形式の埋め込み documents は _legacy_pages で正規化）なので、そのまま使う
+        return (Document(page_content=page_content, metadata=metadata)
+                for page_content, metadata in pages)
+    
+    def _store_cache_entry(self, file_name: str, file_hash: str, doc_type: str,
+                           documents: List[Document]):
+        """読み込んだドキュメントの本体を追記し、キャッシュログに登録する"""
+        # キャッシュに保存（メタデータは既に正規化済み）
+        pages = [(doc.page_content, doc.metadata) for doc in documents]
+        payload = pickle.dumps(pages, protocol=_PICKLE_PROTOCOL)
+        with open(self.blob_file, "ab") as blob:
+            blob_offset = blob.tell()
+            blob.write(payload)
         
-        # ドキュメントタイプの判定
-        doc_type = self._identify_document_type(file_name)
+        size, mtime_ns = self._file_stats.get(file_name, (None, None))
+        self.cache[file_name] = {
+            "hash_algo": _HASH_ALGO,
+            "hash": file_hash,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "loaded_at": datetime.now().isoformat(),
+            "document_type": doc_type,
+            "page_count": len(documents),
+            "api_functions_count": _count_api_functions(doc.metadata for doc in documents),
+            "blob_offset": blob_offset,
+            "blob_len": len(payload)
+        }
+        self._append_cache(file_name)
+    
+    @classmethod
+    def _parse_pdf(cls, pdf_path: Path, doc_type: str) -> Optional[List[Document]]:
+        """
+        PDFを解析してDocumentリストを作る（キャッシュには触れない）
+        
+        インスタンス状態を使わないため、ワーカープロセスからも呼び出せる
+        
+        Returns:
+            ページごとのDocumentのリスト。抽出に失敗した場合は None
+        """
+        file_name = pdf_path.name
+        print(f"[INFO] Loading PDF: {pdf_path}")
         
         # PDFを読み込む（複数の方法を試す）
         documents = []
+        page_texts, total_pages, method = cls._extract_page_texts(pdf_path)
+        if method is None:
+            return None
         
-        try:
-            # 方法1: pdfplumber（表や構造化データの抽出に優れる）
-            with pdfplumber.open(pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        # セクション情報を抽出
-                        section = self._extract_section_info(text, i+1)
-                        
-                        # 基本メタデータ
-                        metadata = {
-                            "source": str(pdf_path),
-                            "page": i + 1,
-                            "total_pages": len(pdf.pages),
-                            "document_type": doc_type,
-                            "section": section,
-                            "file_name": file_name,
-                            "extraction_method": "pdfplumber"
-                        }
-                        
-                        # メタデータを正規化してからDocumentを作成
-                        sanitized_metadata = sanitize_metadata_for_chroma(metadata)
-                        
-                        doc = Document(
-                            page_content=text,
-                            metadata=sanitized_metadata
-                        )
-                        documents.append(doc)
-        except Exception as e:
-            print(f"[WARN] pdfplumber failed: {e}")
-            
-            # 方法2: PyPDF2（フォールバック）
-            try:
-                with open(pdf_path, "rb") as f:
-                    pdf_reader = PyPDF2.PdfReader(f)
-                    for i, page in enumerate(pdf_reader.pages):
-                        text = page.extract_text()
-                        if text:
-                            section = self._extract_section_info(text, i+1)
-                            
-                            metadata = {
-                                "source": str(pdf_path),
-                                "page": i + 1,
-                                "total_pages": len(pdf_reader.pages),
-                                "document_type": doc_type,
-                                "section": section,
-                                "file_name": file_name,
-                                "extraction_method": "PyPDF2"
-                            }
-                            
-                            sanitized_metadata = sanitize_metadata_for_chroma(metadata)
-                            
-                            doc = Document(
-                                page_content=text,
-                                metadata=sanitized_metadata
-                            )
-                            documents.append(doc)
-            except Exception as e:
-                print(f"[ERROR] Failed to load PDF: {e}")
-                return []
+        for i, text in enumerate(page_texts):
+            if text:
+                # セクション情報を抽出
+                section = cls._extract_section_info(text, i+1)
+                
+                # 基本メタデータ
+                metadata = {
+                    "source": str(pdf_path),
+                    "page": i + 1,
+                    "total_pages": total_pages,
+                    "document_type": doc_type,
+                    "section": section,
+                    "file_name": file_name,
+                    "extraction_method": method
+                }
+                
+                # メタデータを正規化してからDocumentを作成
+                sanitized_metadata = sanitize_metadata_for_chroma(metadata)
+                
+                doc = Document(
+                    page_content=text,
+                    metadata=sanitized_metadata
+                )
+                documents.append(doc)
         
         # API関数情報を抽出して追加
-        documents = self._enrich_with_api_info(documents, doc_type)
+        return cls._enrich_with_api_info(documents, doc_type)
+    
+    @classmethod
+    def _extract_page_texts(cls, pdf_path: Path):
+        """
+        ページごとのテキストを抽出する
         
-        # キャッシュに保存（正規化前のメタデータで保存）
-        cache_docs = []
-        for doc in documents:
-            cache_docs.append({
-                "page_content": doc.page_content,
-                "metadata": doc.metadata  # 既に正規化済み
-            })
+        PyMuPDF → PyPDF2 → pdfplumber の順に試し、テキストが得られた最初の方法を採用する
+        （スキャン PDF や壊れた PDF で前段が空テキストになった場合も次の方法へ進む）
         
-        self.cache[file_name] = {
-            "hash": file_hash,
-            "loaded_at": datetime.now().isoformat(),
-            "document_type": doc_type,
-            "page_count": len(documents),
-            "documents": cache_docs
-        }
-        self._save_cache()
+        Returns:
+            (ページごとのテキストのリスト, 総ページ数, 抽出方法名)。すべて失敗した場合は方法名が None
+        """
+        extractors = []
+        if PYMUPDF_AVAILABLE:
+            extractors.append(("pymupdf", cls._extract_with_pymupdf))
+        extractors.append(("PyPDF2", cls._extract_with_pypdf2))
+        extractors.append(("pdfplumber", cls._extract_with_pdfplumber))
         
-        print(f"[INFO] Loaded {len(documents)} pages from {file_name}")
-        return documents
+        for method, extract in extractors:
+            try:
+                page_texts = extract(pdf_path)
+            except Exception as e:
+                print(f"[WARN] {method} failed: {e}")
+                continue
+            if any(page_texts):
+                return page_texts, len(page_texts), method
+            print(f"[WARN] {method} extracted no text from {pdf_path.name}")
+        
+        print(f"[ERROR] Failed to load PDF: {pdf_path}")
+        return [], 0, None
     
-    def _identify_document_type(self, file_name: str) -> str:
+    @staticmethod
+    def _extract_with_pymupdf(pdf_path: Path) -> List[str]:
+        """PyMuPDF でページごとのテキストを抽出"""
+        doc = fitz.open(pdf_path)
+        try:
+            return [page.get_text("text") for page in doc]
+        finally:
+            # 大きな PDF でメモリが残り続けないよう明示的に閉じる
+            doc.close()
+    
+    @staticmethod
+    def _extract_with_pypdf2(pdf_path: Path) -> List[str]:
+        """PyPDF2 でページごとのテキストを抽出"""
+        with open(pdf_path, "rb") as f:
+            pdf_reader = PyPDF2.PdfReader(f)
+            return [page.extract_text() for page in pdf_reader.pages]
+    
+    @staticmethod
+    def _extract_with_pdfplumber(pdf_path: Path) -> List[str]:
+        """pdfplumber でページごとのテキストを抽出（最も遅いため最後の手段）"""
+        with pdfplumber.open(pdf_path) as pdf:
+            return [page.extract_text() for page in pdf.pages]
+    
+    @staticmethod
+    def _identify_document_type(file_name: str) -> str:
         """ファイル名からドキュメントタイプを判定"""
         name_lower = file_name.lower()
         
@@ -230,54 +456,28 @@ class TEEDocumentLoader:
         else:
             return "TEE_Generic"
     
-    def _extract_section_info(self, text: str, page_num: int) -> str:
+    @staticmethod
+    def _extract_section_info(text: str, page_num: int) -> str:
         """テキストからセクション情報を抽出"""
         lines = text.split('\n')
         
-        # セクション番号のパターン
-        section_patterns = [
-            r'^\d+\.\d+',  # 1.1, 2.3 など
-            r'^Chapter \d+',
-            r'^Section \d+',
-            r'^Appendix [A-Z]'
-        ]
-        
         for line in lines[:20]:  # 最初の20行をチェック
             line = line.strip()
             if line:
-                import re
-                for pattern in section_patterns:
-                    if re.match(pattern, line):
+                for pattern in _SECTION_PATTERNS:
+                    if pattern.match(line):
                         return line
         
         return f"Page {page_num}"
     
-    def _enrich_with_api_info(self, documents: List[Document], doc_type: str) -> List[Document]:
+    @staticmethod
+    def _enrich_with_api_info(documents: List[Document], doc_type: str) -> List[Document]:
         """API関数情報でドキュメントを強化（修正版）"""
-        # TEE API関数のパターン
-        api_patterns = {
-            "TEE_Internal_API": [
-                r'TEE_[A-Za-z]+[A-Za-z0-9_]*\s*\(',
-                r'TA_[A-Za-z]+[A-Za-z0-9_]*\s*\('
-            ],
-            "TEE_Client_API": [
-                r'TEEC_[A-Za-z]+[A-Za-z0-9_]*\s*\('
-            ]
-        }
-        
-        import re
+        pattern = _API_PATTERNS.get(doc_type)
         
         for doc in documents:
-            # API関数を抽出
-            found_apis = set()
-            patterns = api_patterns.get(doc_type, [])
-            
-            for pattern in patterns:
-                matches = re.findall(pattern, doc.page_content)
-                for match in matches:
-                    # 関数名のみを抽出（括弧を除く）
-                    func_name = match.rstrip('(').strip()
-                    found_apis.add(func_name)
+            # API関数を抽出（キャプチャグループが関数名のみを返す）
+            found_apis = set(pattern.findall(doc.page_content)) if pattern else set()
             
             # メタデータに追加（ChromaDB対応版）
             if found_apis:
@@ -291,21 +491,70 @@ class TEEDocumentLoader:
         
         return documents
     
-    def load_all_documents(self) -> List[Document]:
-        """documentsディレクトリ内のすべてのPDFを読み込む"""
-        all_documents = []
+    def load_all_documents(self, max_workers: Optional[int] = None) -> List[Document]:
+        """
+        documentsディレクトリ内のすべてのPDFを読み込む
+        
+        Args:
+            max_workers: 並列プロセス数（None なら CPU 数）
+        """
+        return list(self.iter_all_documents(max_workers))
+    
+    def iter_all_documents(self, max_workers: Optional[int] = None) -> Iterator[Document]:
+        """
+        documentsディレクトリ内のすべてのPDFのDocumentをファイル順に返すジェネレータ
+        
+        キャッシュにない PDF はプロセスプールで並列に解析し、結果はファイルごとにキャッシュログへ追記する。
+        キャッシュ済みの PDF は順番が来たときに 1 ファイルずつ読み出す
         
+        Args:
+            max_workers: 並列プロセス数（None なら CPU 数）
+        """
         pdf_files = list(self.documents_dir.glob("*.pdf"))
         print(f"[INFO] Found {len(pdf_files)} PDF files in {self.documents_dir}")
         
+        # ヒット判定はハッシュの比較だけで済ませ、未キャッシュの PDF を先に解析へ回す
+        plan: List[Tuple[Path, str, bool]] = []
         for pdf_path in pdf_files:
             try:
-                docs = self.load_pdf_with_metadata(pdf_path)
-                all_documents.extend(docs)
+                file_hash = self._get_file_hash(pdf_path)
             except Exception as e:
                 print(f"[ERROR] Failed to load {pdf_path}: {e}")
+                continue
+            plan.append((pdf_path, file_hash, self._has_cached_documents(pdf_path.name, file_hash)))
         
-        return all_documents
+        pending = [pdf_path for pdf_path, _, cached in plan if not cached]
+        workers = min(len(pending), max_workers or os.cpu_count() or 1)
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        futures = {}
+        if executor is not None:
+            futures = {pdf_path: executor.submit(_load_one_pdf, pdf_path) for pdf_path in pending}
+        
+        try:
+            for pdf_path, file_hash, cached in plan:
+                documents = self._iter_cached_documents(pdf_path.name) if cached else None
+                if documents is None:
+                    future = futures.get(pdf_path)
+                    get_result = future.result if future is not None else partial(_load_one_pdf, pdf_path)
+                    documents = self._collect_loaded_pdf(pdf_path, file_hash, get_result)
+                yield from documents
+        finally:
+            if executor is not None:
+                # 途中で打ち切られた場合も未着手の解析は取り消す
+                executor.shutdown(cancel_futures=True)
+    
+    def _collect_loaded_pdf(self, pdf_path: Path, file_hash: str, get_result) -> List[Document]:
+        """_load_one_pdf の結果をキャッシュに反映し、Documentリストを返す（失敗時は空リスト）"""
+        try:
+            doc_type, documents = get_result()
+        except Exception as e:
+            print(f"[ERROR] Failed to load {pdf_path}: {e}")
+            return []
+        if documents is None:
+            return []
+        self._store_cache_entry(pdf_path.name, file_hash, doc_type, documents)
+        print(f"[INFO] Loaded {len(documents)} pages from {pdf_path.name}")
+        return documents
     
     def get_document_summary(self) -> Dict[str, Any]:
         """読み込まれたドキュメントのサマリーを取得"""
@@ -315,11 +564,15 @@ class TEEDocumentLoader:
         }
         
         for file_name, info in self.cache.items():
-            api_functions_count = 0
-            for doc in info.get("documents", []):
-                api_functions_str = doc.get("metadata", {}).get("api_functions", "")
-                if api_functions_str:
-                    api_functions_count += len(api_functions_str.split(","))
+            # 件数はキャッシュ登録時に集計済み（旧形式のエントリは埋め込まれた documents から数える）
+            if "api_functions_count" in info:
+                api_functions_count = info["api_functions_count"]
+            else:
+                try:
+                    api_functions_count = _count_api_functions(
+                        metadata for _, metadata in _legacy_pages(info))
+                except (KeyError, TypeError, AttributeError):
+                    api_functions_count = 0
             
             summary["documents"].append({
                 "file_name": file_name,
@@ -332,6 +585,36 @@ class TEEDocumentLoader:
         return summary
 
 
+def _legacy_pages(info: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    旧形式のエントリに埋め込まれた documents を (本文, 正規化済みメタデータ) のリストにする
+    
+    旧形式は正規化前のメタデータ（リスト・辞書）を保存していた場合があるため、ここで正規化する
+    """
+    return [(d["page_content"], sanitize_metadata_for_chroma(d["metadata"]))
+            for d in info.get("documents", [])]
+
+
+def _count_api_functions(metadatas) -> int:
+    """メタデータ群の api_functions（カンマ区切り）に含まれる関数名の総数"""
+    count = 0
+    for metadata in metadatas:
+        api_functions_str = metadata.get("api_functions", "")
+        if api_functions_str:
+            count += len(api_functions_str.split(","))
+    return count
+
+
+def _load_one_pdf(pdf_path: Path) -> Tuple[str, Optional[List[Document]]]:
+    """
+    1 つの PDF を解析して (ドキュメントタイプ, Documentリスト) を返す
+    
+    ProcessPoolExecutor から呼べるようモジュールレベルに置く（キャッシュは親プロセスで更新する）
+    """
+    doc_type = TEEDocumentLoader._identify_document_type(pdf_path.name)
+    return doc_type, TEEDocumentLoader._parse_pdf(pdf_path, doc_type)
+
+
 def main():
     """テスト用のメイン関数"""
     loader = TEEDocumentLoader()